@@ -6,9 +6,14 @@ REST API for campaign analysis and trend prediction.
 
 import os
 import sys
+import asyncio
+import functools
+import threading
+import multiprocessing
 from datetime import datetime
 from typing import List, Optional
 from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
@@ -43,6 +48,14 @@ def get_data_file_path(filename: str) -> str:
     return filename
 
 
+def find_trend_data_file() -> Optional[str]:
+    """Trend dataset used by the analysis endpoints, or None if missing."""
+    data_file = get_data_file_path("data/final_trends_dataset_v2.xlsx")
+    if not os.path.exists(data_file):
+        data_file = get_data_file_path("data/trend_data.csv")
+    return data_file if os.path.exists(data_file) else None
+
+
 # --- PYDANTIC SCHEMAS ---
 
 class CampaignInput(BaseModel):
@@ -67,14 +80,93 @@ class HashtagCompareInput(BaseModel):
 class TrendAnalysisInput(BaseModel):
     """Input schema for trend file analysis."""
     trend_name: Optional[str] = Field(None, description="Specific trend to analyze")
+    start_date: Optional[str] = Field(None, description="First day to include (YYYY-MM-DD)")
+    end_date: Optional[str] = Field(None, description="Last day to include (YYYY-MM-DD)")
+    platform: Optional[str] = Field(None, description="Only rows from this platform")
+    archetype: Optional[str] = Field(None, description="Only rows of this archetype")
 
 # --- FASTAPI APP ---
 
+# --- WORKER POOLS ---
+# Blocking work never runs on the event loop: HMM decoding goes to a bounded
+# process pool, file/database reads and advisor (Gemini, Reddit, search)
+# calls to a thread pool.
+DECODE_WORKERS = int(os.getenv("TRENDGUARD_DECODE_WORKERS", str(min(4, os.cpu_count() or 1))))
+IO_WORKERS = int(os.getenv("TRENDGUARD_IO_WORKERS", "16"))
+
+_decode_pool = None
+_io_pool = None
+_worker_analyzer = None
+
+# Registry model version pinned at startup; the API and the decode workers
+# all use this one so cache keys and decoded states stay consistent
+_model_version = None
+
+def _init_decode_worker(model_name, version):
+    """Map the same registry model version once per decode worker."""
+    global _worker_analyzer
+    from trendguard.hmm_engine import registry
+    from trendguard.hmm_engine.decoder import viterbi_gaussian, forward_backward, alternative_decline_points
+    _worker_analyzer = (registry.load(model_name, version), viterbi_gaussian, forward_backward, alternative_decline_points)
+
+def _decode_task(df, trend_label):
+    hmm, decoder, posterior, alternatives = _worker_analyzer
+    return compute_trend_analysis(df, trend_label, hmm, decoder, posterior, alternatives)
+
+def _decode_states_task(values, offsets):
+    """Batch-decode a whole corpus; returns (state index paths, model hash)."""
+    from trendguard.hmm_engine.decoder import viterbi_batch
+    hmm = _worker_analyzer[0]
+    return viterbi_batch(hmm, values, offsets), hmm.model_hash
+
+async def run_io(func, *args, **kwargs):
+    """Run blocking I/O-bound work on the thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_pool, functools.partial(func, *args, **kwargs))
+
+async def run_decode(df, trend_label):
+    """
+    Run the HMM analysis of one trend on the process pool (falls back to the
+    thread pool when no pool is running, e.g. the registry was unavailable).
+    """
+    loop = asyncio.get_running_loop()
+    if _decode_pool is not None:
+        return await loop.run_in_executor(_decode_pool, _decode_task, df, trend_label)
+    analyzer = get_hmm_analyzer()
+    return await run_io(
+        compute_trend_analysis, df, trend_label, analyzer["hmm"], analyzer["decoder"],
+        analyzer["posterior"], analyzer["alternatives"]
+    )
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events."""
+    global _decode_pool, _io_pool, _result_cache, _model_version
     print("🚀 TrendGuard API Starting...")
+    _io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="trendguard-io")
+    _result_cache = _create_result_cache()
+    try:
+        from trendguard.hmm_engine import registry
+        hmm = registry.get_model()
+        _model_version = hmm.version
+        print(f"📐 HMM {registry.DEFAULT_MODEL_NAME} v{hmm.version} ({hmm.model_hash[:12]}) mapped")
+        # Spawned, not forked: workers start lazily, after the I/O threads,
+        # and forking a threaded process can copy held locks into the child
+        _decode_pool = ProcessPoolExecutor(
+            max_workers=DECODE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_decode_worker,
+            initargs=(registry.DEFAULT_MODEL_NAME, hmm.version)
+        )
+        print(f"⚙️ {DECODE_WORKERS} decode worker(s), {IO_WORKERS} I/O thread(s)")
+    except Exception as e:
+        print(f"⚠️ Model registry unavailable: {e}")
     yield
+    if _decode_pool is not None:
+        _decode_pool.shutdown(cancel_futures=True)
+        _decode_pool = None
+    _io_pool.shutdown(wait=False, cancel_futures=True)
+    _io_pool = None
     print("👋 TrendGuard API Shutting down...")
 
 app = FastAPI(
@@ -97,10 +189,15 @@ app.add_middleware(
 _gemini_advisor = None
 _hmm_analyzer = None
 
+# Services are created from I/O pool threads, so initialization is serialized
+_init_lock = threading.RLock()
+
 def get_gemini_advisor():
     """Lazy load Gemini advisor."""
     global _gemini_advisor
-    if _gemini_advisor is None:
+    with _init_lock:
+        if _gemini_advisor is not None:
+            return _gemini_advisor
         try:
             from trendguard.gemini_advisor import CampaignAdvisor
             _gemini_advisor = CampaignAdvisor()
@@ -111,48 +208,124 @@ def get_gemini_advisor():
 def get_hmm_analyzer():
     """Lazy load HMM analyzer components."""
     global _hmm_analyzer
-    if _hmm_analyzer is None:
+    with _init_lock:
+        if _hmm_analyzer is not None:
+            return _hmm_analyzer
         try:
             import numpy as np
             import pandas as pd
-            from trendguard.hmm_engine.hmm import HiddenMarkovModel
-            from trendguard.hmm_engine.decoder import viterbi_gaussian
+            from trendguard.hmm_engine import registry
+            from trendguard.hmm_engine.decoder import viterbi_gaussian, forward_backward, alternative_decline_points
             from trendguard.explainability.langchain_agent import TrendInvestigator
             
-            # Create 5-state HMM
-            states = ["Emerging", "Growth", "Peak", "Saturation", "Decline"]
-            emission_means = np.array([
-                [0.3, 0.1, 0.4], [0.8, 0.2, 0.8], [0.9, 0.4, 0.9],
-                [0.5, 0.6, 0.6], [0.2, 0.8, 0.3]
-            ])
-            emission_covs = np.array([
-                np.eye(3)*0.08, np.eye(3)*0.05, np.eye(3)*0.04,
-                np.eye(3)*0.08, np.eye(3)*0.10
-            ])
-            transition_matrix = np.array([
-                [0.6, 0.35, 0.05, 0.0, 0.0],
-                [0.0, 0.5, 0.45, 0.05, 0.0],
-                [0.0, 0.0, 0.4, 0.5, 0.1],
-                [0.0, 0.0, 0.0, 0.5, 0.5],
-                [0.0, 0.0, 0.0, 0.0, 1.0]
-            ])
-            initial_probs = np.array([0.8, 0.2, 0.0, 0.0, 0.0])
-            
-            hmm = HiddenMarkovModel(
-                states=states, emission_means=emission_means,
-                emission_covs=emission_covs, transition_matrix=transition_matrix,
-                initial_probs=initial_probs
-            )
+            # Shared, memory-mapped 5-state HMM from the model registry,
+            # the version pinned at startup when the API is running
+            if _model_version is not None:
+                hmm = registry.load(registry.DEFAULT_MODEL_NAME, _model_version)
+            else:
+                hmm = registry.get_model()
             investigator = TrendInvestigator()
             
             _hmm_analyzer = {
-                "hmm": hmm, "decoder": viterbi_gaussian,
-                "investigator": investigator, "pd": pd, "np": np
+                "hmm": hmm, "decoder": viterbi_gaussian, "posterior": forward_backward,
+                "alternatives": alternative_decline_points,
+                "investigator": investigator, "pd": pd, "np": np,
+                "model_hash": hmm.model_hash
             }
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"HMM initialization failed: {str(e)}")
     return _hmm_analyzer
 
+_trend_db = None
+_result_cache = None
+
+# Decode result cache: in-memory LRU size, plus an optional directory that
+# keeps results across restarts (unset = memory only)
+RESULT_CACHE_SIZE = int(os.getenv("TRENDGUARD_RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_DIR = os.getenv("TRENDGUARD_RESULT_CACHE_DIR")
+
+def _create_result_cache():
+    from trendguard.hmm_engine.result_cache import DecodeResultCache
+    return DecodeResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_DIR)
+
+def get_result_cache():
+    """
+    Decode result cache, created in lifespan so request handlers on the
+    event loop never wait for a lock (created here only outside the app).
+    """
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = _create_result_cache()
+    return _result_cache
+
+# Serializes database rebuilds and state rewrites; kept separate from
+# _init_lock so a slow rebuild never holds up service initialization
+_db_lock = threading.Lock()
+_states_lock = None
+
+def get_trend_db():
+    """Query database over the trend dataset, rebuilt when the file changes."""
+    global _trend_db
+    data_file = find_trend_data_file()
+    if data_file is None:
+        return None
+    
+    from trendguard.utils.trend_db import TrendDatabase
+    with _db_lock:
+        if _trend_db is None or _trend_db.source != data_file:
+            _trend_db = TrendDatabase(data_file)
+        else:
+            _trend_db.refresh()
+        return _trend_db
+
+def _load_state_index(db, features):
+    """Observations of every trend, as a TrendIndex, for a full states decode."""
+    from trendguard.utils.data_loader import load_dataset, TrendIndex
+    return TrendIndex(load_dataset(db.source, columns=["trend_name", "date"] + features), features)
+
+def _write_states(db, index, paths, model_hash, state_names):
+    states = index.df[["trend_name", "date"]].assign(
+        state=[state_names[int(i)] for path in paths for i in path]
+    )
+    with _db_lock:
+        db.write_states(states, model_hash)
+
+async def get_trend_db_with_states():
+    """
+    Query database whose decoded states match the current data and model.
+    A stale corpus is re-decoded on the process pool; reads and the states
+    write run on the I/O threads.
+    """
+    global _states_lock
+    db = await run_io(get_trend_db)
+    if db is None:
+        return None
+    
+    analyzer = await run_io(get_hmm_analyzer)
+    if await run_io(db.states_model_hash) == analyzer["model_hash"]:
+        return db
+    
+    if _states_lock is None:
+        _states_lock = asyncio.Lock()
+    async with _states_lock:
+        # Another request may have refreshed the states while we waited
+        if await run_io(db.states_model_hash) == analyzer["model_hash"]:
+            return db
+        
+        hmm = analyzer["hmm"]
+        index = await run_io(_load_state_index, db, hmm.features)
+        if _decode_pool is not None:
+            loop = asyncio.get_running_loop()
+            paths, model_hash = await loop.run_in_executor(
+                _decode_pool, _decode_states_task, index.values, index.offsets
+            )
+        else:
+            from trendguard.hmm_engine.decoder import viterbi_batch
+            paths = await run_io(viterbi_batch, hmm, index.values, index.offsets)
+            model_hash = hmm.model_hash
+        await run_io(_write_states, db, index, paths, model_hash, hmm.states)
+    return db
+
 # --- API ENDPOINTS ---
 
 @app.get("/")
@@ -190,9 +363,10 @@ async def analyze_campaign(campaign: CampaignInput):
     Analyze a campaign before launch using Gemini with Google Search grounding.
     Returns viability score, predictions, and recommendations.
     """
-    advisor = get_gemini_advisor()
+    advisor = await run_io(get_gemini_advisor)
     
-    result = advisor.analyze_campaign(
+    result = await run_io(
+        advisor.analyze_campaign,
         topic=campaign.topic,
         hashtags=campaign.hashtags,
         platform=campaign.platform,
@@ -212,8 +386,8 @@ async def check_trend_health(input: TrendHealthInput):
     """
     Quick health check on an existing trend using real-time search.
     """
-    advisor = get_gemini_advisor()
-    result = advisor.check_trend_health(input.trend_name)
+    advisor = await run_io(get_gemini_advisor)
+    result = await run_io(advisor.check_trend_health, input.trend_name)
     
     if "error" in result:
         raise HTTPException(status_code=500, detail=result["error"])
@@ -225,8 +399,8 @@ async def compare_hashtags(input: HashtagCompareInput):
     """
     Compare multiple hashtags to find the best performing ones.
     """
-    advisor = get_gemini_advisor()
-    result = advisor.compare_hashtags(input.hashtags, input.platform)
+    advisor = await run_io(get_gemini_advisor)
+    result = await run_io(advisor.compare_hashtags, input.hashtags, input.platform)
     
     if "error" in result:
         raise HTTPException(status_code=500, detail=result["error"])
@@ -234,44 +408,24 @@ async def compare_hashtags(input: HashtagCompareInput):
     return result
 
 @app.get("/api/trends/list")
-async def list_trends():
+async def list_trends(
+    platform: Optional[str] = None,
+    archetype: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+):
     """
-    List available trends from the dataset.
+    List available trends from the dataset, optionally only those on a
+    platform / of an archetype / with data inside a date range.
     """
     try:
-        analyzer = get_hmm_analyzer()
-        pd = analyzer["pd"]
-        
-        # Use helper to find data file
-        data_file = get_data_file_path("data/final_trends_dataset_v2.xlsx")
-        if not os.path.exists(data_file):
-            data_file = get_data_file_path("data/trend_data.csv")
-        
-        if not os.path.exists(data_file):
+        db = await run_io(get_trend_db)
+        if db is None:
             return {"trends": [], "count": 0, "message": "No data files found"}
         
-        # Read file based on extension
-        if data_file.endswith('.xlsx'):
-            df = pd.read_excel(data_file)
-        else:
-            df = pd.read_csv(data_file)
-        
-        if "trend_name" in df.columns:
-            trends = df.groupby("trend_name").agg({
-                "date": ["min", "max", "count"]
-            }).reset_index()
-            trends.columns = ["trend_name", "start_date", "end_date", "data_points"]
-            
-            if "archetype" in df.columns:
-                archetypes = df.groupby("trend_name")["archetype"].first().to_dict()
-                trends["archetype"] = trends["trend_name"].map(archetypes)
-            
-            return {
-                "trends": trends.to_dict(orient="records"),
-                "count": len(trends)
-            }
-        
-        return {"trends": [{"trend_name": "Default", "data_points": len(df)}], "count": 1}
+        # Indexed read of the per-trend summary table
+        trends = await run_io(db.list_trends, platform, archetype, start_date, end_date)
+        return {"trends": trends, "count": len(trends)}
     
     except Exception as e:
         import traceback
@@ -282,98 +436,185 @@ async def list_trends():
             detail=f"Failed to load trends: {str(e)}"
         )
 
-@app.post("/api/trends/analyze")
-async def analyze_trend(input: TrendAnalysisInput):
+@app.get("/api/trends/states")
+async def trends_by_state(
+    state: str,
+    platform: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+):
     """
-    Run HMM analysis on trend data and generate explanation.
+    Trends that were in a lifecycle state within a date range, e.g.
+    /api/trends/states?state=Saturation&platform=tiktok&start_date=2026-01-01
     """
     try:
-        analyzer = get_hmm_analyzer()
-        pd = analyzer["pd"]
-        np = analyzer["np"]
-        hmm = analyzer["hmm"]
-        decoder = analyzer["decoder"]
-        
-        data_file = get_data_file_path("data/final_trends_dataset_v2.xlsx")
-        if not os.path.exists(data_file):
-            data_file = get_data_file_path("data/trend_data.csv")
-        
-        if not os.path.exists(data_file):
-            raise HTTPException(status_code=404, detail="No trend data found")
-        
-        # Read file based on extension
-        if data_file.endswith('.xlsx'):
-            df = pd.read_excel(data_file)
-        else:
-            df = pd.read_csv(data_file)
-        
-        # Filter by trend name if specified
-        if input.trend_name and "trend_name" in df.columns:
-            df = df[df["trend_name"] == input.trend_name].copy()
-            if len(df) == 0:
-                raise HTTPException(status_code=404, detail=f"Trend '{input.trend_name}' not found")
-        
-        # Reset index to ensure alignment
-        df = df.reset_index(drop=True)
-        
-        # Run HMM inference
-        observations = df[["velocity", "fatigue", "retention"]].values
-        state_sequence = decoder(hmm, observations)
-        
-        # Find decline point (without expensive AI investigation for speed)
-        decline_info = None
-        for i, state in enumerate(state_sequence):
-            if state in ["Saturation", "Decline"]:
-                row = df.iloc[i]
-                metrics = {
-                    "velocity": float(row["velocity"]),
-                    "fatigue": float(row["fatigue"]),
-                    "retention": float(row["retention"])
-                }
-                
-                # Add extended metrics if available
-                for col in ["sentiment", "engagement_rate", "content_originality"]:
-                    if col in df.columns:
-                        metrics[col] = float(row[col])
-                
-                archetype = str(row["archetype"]) if "archetype" in df.columns else None
-                
-                decline_info = {
-                    "detected": True,
-                    "date": str(row["date"]),
-                    "index": i,
-                    "state": state,
-                    "metrics": metrics,
-                    "archetype": archetype,
-                    "investigation": {
-                        "explanation": f"Trend '{input.trend_name or 'Unknown'}' detected entering {state} phase on {row['date']}. Velocity dropped to {metrics['velocity']:.2f}, fatigue increased to {metrics['fatigue']:.2f}. Pattern matched: {archetype}.",
-                        "confidence_score": 0.85
-                    }
-                }
-                break
-        
-        # Build lifecycle data with proper indexing
-        lifecycle_data = []
-        for idx in range(len(df)):
-            row = df.iloc[idx]
-            lifecycle_data.append({
-                "date": str(row["date"]),
-                "velocity": float(row["velocity"]),
-                "fatigue": float(row["fatigue"]),
-                "retention": float(row["retention"]),
-                "state": state_sequence[idx]
-            })
+        db = await get_trend_db_with_states()
+        if db is None:
+            return {"trends": [], "count": 0, "state_counts": {}, "message": "No data files found"}
         
+        trends = await run_io(db.trends_in_state, state, platform, start_date, end_date)
         return {
-            "trend_name": input.trend_name or "Default",
-            "total_points": len(df),
-            "state_distribution": {s: state_sequence.count(s) for s in set(state_sequence)},
-            "decline_detected": decline_info is not None,
-            "decline_info": decline_info,
-            "lifecycle_data": lifecycle_data[:100]  # Limit to 100 points
+            "trends": trends,
+            "count": len(trends),
+            "state_counts": await run_io(db.state_counts, platform, start_date, end_date)
         }
     except HTTPException:
         raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"State query failed: {str(e)}")
+
+def compute_trend_analysis(df, trend_label, hmm, decoder, posterior, alternatives):
+    """
+    HMM analysis payload for one trend's rows: states, decline point,
+    alternative decline dates and lifecycle data.
+    """
+    df = df.reset_index(drop=True)
+    
+    # Run HMM inference
+    observations = df[hmm.features].values
+    state_sequence = decoder(hmm, observations)
+    
+    # Per-day posterior probability of Saturation or Decline
+    posteriors, _ = posterior(hmm, observations)
+    decline_idx = [hmm.state_to_idx[s] for s in ["Saturation", "Decline"]]
+    decline_probs = posteriors[:, decline_idx].sum(axis=1)
+    
+    # Find decline point (without expensive AI investigation for speed)
+    decline_info = None
+    for i, state in enumerate(state_sequence):
+        if state in ["Saturation", "Decline"]:
+            row = df.iloc[i]
+            metrics = {
+                "velocity": float(row["velocity"]),
+                "fatigue": float(row["fatigue"]),
+                "retention": float(row["retention"])
+            }
+            
+            # Add extended metrics if available
+            for col in ["sentiment", "engagement_rate", "content_originality"]:
+                if col in df.columns:
+                    metrics[col] = float(row[col])
+            
+            archetype = str(row["archetype"]) if "archetype" in df.columns else None
+            
+            decline_info = {
+                "detected": True,
+                "date": str(row["date"]),
+                "index": i,
+                "state": state,
+                "metrics": metrics,
+                "archetype": archetype,
+                "investigation": {
+                    "explanation": f"Trend '{trend_label}' detected entering {state} phase on {row['date']}. Velocity dropped to {metrics['velocity']:.2f}, fatigue increased to {metrics['fatigue']:.2f}. Pattern matched: {archetype}.",
+                    "confidence_score": float(decline_probs[i])
+                }
+            }
+            break
+    
+    # Decline dates under the next most likely state sequences
+    decline_alternatives = []
+    for alt in alternatives(hmm, observations, k=5):
+        alt["date"] = str(df.iloc[alt["index"]]["date"]) if alt["index"] is not None else None
+        decline_alternatives.append(alt)
+    
+    # Build lifecycle data with proper indexing
+    lifecycle_data = []
+    for idx in range(len(df)):
+        row = df.iloc[idx]
+        lifecycle_data.append({
+            "date": str(row["date"]),
+            "velocity": float(row["velocity"]),
+            "fatigue": float(row["fatigue"]),
+            "retention": float(row["retention"]),
+            "state": state_sequence[idx],
+            "decline_probability": float(decline_probs[idx])
+        })
+    
+    return {
+        "trend_name": trend_label,
+        "total_points": len(df),
+        "state_distribution": {s: state_sequence.count(s) for s in set(state_sequence)},
+        "decline_detected": decline_info is not None,
+        "decline_info": decline_info,
+        "decline_alternatives": decline_alternatives,
+        "model_hash": hmm.model_hash,
+        "lifecycle_data": lifecycle_data[:100]  # Limit to 100 points
+    }
+
+
+def load_trend_analysis(input: TrendAnalysisInput):
+    """
+    Read the requested rows and look up a cached analysis of them.
+    
+    Returns:
+        Tuple of (rows, trend label, (label, fingerprint, model hash),
+        cached result or None)
+    """
+    from trendguard.utils.data_loader import load_dataset
+    from trendguard.hmm_engine.result_cache import frame_fingerprint
+    
+    analyzer = get_hmm_analyzer()
+    hmm = analyzer["hmm"]
+    
+    data_file = find_trend_data_file()
+    if data_file is None:
+        raise HTTPException(status_code=404, detail="No trend data found")
+    
+    columns = list(dict.fromkeys(
+        ["date", "trend_name", "archetype", "velocity", "fatigue", "retention",
+         "sentiment", "engagement_rate", "content_originality"] + hmm.features
+    ))
+    
+    # Filters are pushed down so only the requested rows are read
+    if input.trend_name:
+        # Indexed (trend_name, date) range read
+        df = get_trend_db().trend_rows(
+            input.trend_name, input.start_date, input.end_date, columns,
+            platform=input.platform, archetype=input.archetype
+        )
+        if len(df) == 0:
+            filtered = any([input.start_date, input.end_date, input.platform, input.archetype])
+            detail = f"Trend '{input.trend_name}' has no data matching the filters" if filtered \
+                else f"Trend '{input.trend_name}' not found"
+            raise HTTPException(status_code=404, detail=detail)
+    else:
+        # Predicate pushdown into the columnar cache
+        filters = [
+            f for f in [
+                ("date", ">=", input.start_date), ("date", "<=", input.end_date),
+                ("platform", "==", input.platform), ("archetype", "==", input.archetype)
+            ] if f[2] is not None
+        ]
+        df = load_dataset(data_file, columns=columns, filters=filters)
+        if len(df) == 0:
+            raise HTTPException(status_code=404, detail="No trend data matches the filters")
+    
+    # Reset index to ensure alignment
+    df = df.reset_index(drop=True)
+    
+    # Served from the result cache unless this trend's rows or the model changed
+    trend_label = input.trend_name or "Default"
+    key = (trend_label, frame_fingerprint(df), analyzer["model_hash"])
+    cache = get_result_cache()
+    return df, trend_label, key, cache.get(cache.make_key(*key))
+
+
+@app.post("/api/trends/analyze")
+async def analyze_trend(input: TrendAnalysisInput):
+    """
+    Run HMM analysis on trend data and generate explanation.
+    """
+    try:
+        # Blocking reads run on the I/O threads, decoding on the process pool
+        df, trend_label, key, result = await run_io(load_trend_analysis, input)
+        if result is None:
+            result = await run_decode(df, trend_label)
+            cache = get_result_cache()
+            # Keyed by the hash of the model that actually decoded it
+            await run_io(cache.put, cache.make_key(*key[:2], result["model_hash"]), result)
+        return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis error: {str(e)}")
 
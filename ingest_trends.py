@@ -0,0 +1,34 @@
+"""
+TrendGuard Daily Ingest
+=======================
+Appends daily trend metrics to the partitioned trend store (data/trend_store).
+Run it once per day with that day's export(s); rows for trend-days already in
+the store are skipped, so re-running an ingest is safe.
+"""
+
+import argparse
+
+from trendguard.utils.data_loader import ingest_daily
+from trendguard.utils.trend_store import TrendStore, DEFAULT_STORE_DIR
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Append daily trend metrics to the trend store")
+    parser.add_argument("files", type=str, nargs="+", help="CSV/XLSX files of daily rows")
+    parser.add_argument("--store", type=str, default=DEFAULT_STORE_DIR, help="Trend store directory")
+    args = parser.parse_args()
+    
+    print("🚀 TrendGuard Daily Ingest")
+    print("=" * 40)
+    
+    for filepath in args.files:
+        written = ingest_daily(filepath, args.store)
+        days = sorted({p["date"] for p in written})
+        if written:
+            print(f"📥 {filepath}: {sum(p['rows'] for p in written)} rows, "
+                  f"{len(days)} day(s) ({days[0]} to {days[-1]})")
+        else:
+            print(f"⏭️ {filepath}: no new rows")
+    
+    first, last = TrendStore(args.store).date_range()
+    print(f"\n✅ Store holds {first} to {last}")
@@ -18,8 +18,12 @@ from dotenv import load_dotenv
 
 # Import our modules
 from trendguard.hmm_engine.hmm import HiddenMarkovModel
-from trendguard.hmm_engine.decoder import viterbi_gaussian
-from trendguard.utils.data_loader import load_and_prep_data
+from trendguard.hmm_engine.decoder import (
+    viterbi_gaussian, viterbi_batch, forward_backward, alternative_decline_points
+)
+from trendguard.hmm_engine.forecast import DeclineForecaster
+from trendguard.hmm_engine import registry
+from trendguard.utils.data_loader import load_and_prep_data, TrendIndex, iter_trends
 from trendguard.explainability.langchain_agent import TrendInvestigator
 
 # Load environment variables
@@ -28,59 +32,27 @@ load_dotenv()
 # --- REPORT CONFIGURATION ---
 REPORTS_DIR = "reports"
 
+# Inputs larger than this are streamed trend by trend instead of loaded whole
+STREAM_THRESHOLD_BYTES = 256 * 1024 * 1024
+
 
 def create_5state_hmm():
     """
     Create enhanced 5-state HMM for finer trend lifecycle detection.
     States: Emerging → Growth → Peak → Saturation → Decline
     """
-    states = ["Emerging", "Growth", "Peak", "Saturation", "Decline"]
-    
-    # Emission means for each state [velocity, fatigue, retention]
-    # Extended to support more metrics if available
-    emission_means = np.array([
-        [0.3, 0.1, 0.4],   # Emerging: Low velocity (building), low fatigue, moderate retention
-        [0.8, 0.2, 0.8],   # Growth: High velocity, low fatigue, high retention
-        [0.9, 0.4, 0.9],   # Peak: Maximum velocity, rising fatigue, maximum retention
-        [0.5, 0.6, 0.6],   # Saturation: Dropping velocity, high fatigue, dropping retention
-        [0.2, 0.8, 0.3]    # Decline: Low velocity, very high fatigue, low retention
-    ])
-    
-    # Covariance matrices (tighter = more confident)
-    emission_covs = np.array([
-        np.eye(3) * 0.08,  # Emerging
-        np.eye(3) * 0.05,  # Growth
-        np.eye(3) * 0.04,  # Peak (tight - distinctive)
-        np.eye(3) * 0.08,  # Saturation
-        np.eye(3) * 0.10   # Decline (looser - various patterns)
-    ])
-    
-    # Transition matrix: Generally flows forward, but can skip states
-    transition_matrix = np.array([
-        # Em    Gr    Pk    Sat   Dec
-        [0.6,  0.35, 0.05, 0.0,  0.0 ],  # Emerging → mostly Growth
-        [0.0,  0.5,  0.45, 0.05, 0.0 ],  # Growth → Peak
-        [0.0,  0.0,  0.4,  0.5,  0.1 ],  # Peak → Saturation (or quick decline)
-        [0.0,  0.0,  0.0,  0.5,  0.5 ],  # Saturation → Decline
-        [0.0,  0.0,  0.0,  0.0,  1.0 ]   # Decline → Decline (absorbing)
-    ])
-    
-    # Start in Emerging state
-    initial_probs = np.array([0.8, 0.2, 0.0, 0.0, 0.0])
-    
-    return HiddenMarkovModel(
-        states=states,
-        emission_means=emission_means,
-        emission_covs=emission_covs,
-        transition_matrix=transition_matrix,
-        initial_probs=initial_probs
-    )
+    return registry.default_5state_hmm()
 
 
-def detect_decline_point(df: pd.DataFrame, state_sequence: list) -> dict:
+def detect_decline_point(
+    df: pd.DataFrame,
+    state_sequence: list,
+    decline_probs: np.ndarray = None
+) -> dict:
     """
     Detect the first significant decline point in the state sequence.
     Returns info about when and why decline was detected.
+    decline_probs, if given, holds the per-day posterior P(Saturation or Decline).
     """
     # Find first Saturation or Decline state
     decline_states = ["Saturation", "Decline"]
@@ -92,6 +64,7 @@ def detect_decline_point(df: pd.DataFrame, state_sequence: list) -> dict:
                 "index": i,
                 "date": str(df.iloc[i]["date"]),
                 "state": state,
+                "probability": float(decline_probs[i]) if decline_probs is not None else None,
                 "metrics": {
                     "velocity": float(df.iloc[i]["velocity"]),
                     "fatigue": float(df.iloc[i]["fatigue"]),
@@ -112,29 +85,45 @@ def analyze_single_trend(
     df: pd.DataFrame,
     trend_name: str,
     hmm: HiddenMarkovModel,
-    investigator: TrendInvestigator
+    investigator: TrendInvestigator,
+    state_sequence: list = None,
+    observations: np.ndarray = None
 ) -> dict:
     """
     Analyze a single trend and generate report.
+    A precomputed state_sequence (e.g. from viterbi_batch) skips decoding;
+    observations may be passed as a view from a TrendIndex.
     """
     print(f"\n{'='*50}")
     print(f"📊 Analyzing: {trend_name}")
     print(f"{'='*50}")
     
-    # Get observations (core metrics only for HMM)
-    observations = df[["velocity", "fatigue", "retention"]].values
+    # Get observations (the model's feature columns)
+    if observations is None:
+        observations = df[hmm.features].values
     
-    # Run Viterbi inference
-    print("🧠 Running HMM inference...")
-    state_sequence = viterbi_gaussian(hmm, observations)
+    if state_sequence is None:
+        # Run Viterbi inference
+        print("🧠 Running HMM inference...")
+        state_sequence = viterbi_gaussian(hmm, observations)
     df = df.copy()
     df["state"] = state_sequence
     
     # Detect archetype if available
     archetype = df["archetype"].iloc[0] if "archetype" in df.columns else None
     
+    # Posterior probability of being in a decline phase on each day
+    posteriors, _ = forward_backward(hmm, observations)
+    decline_idx = [hmm.state_to_idx[s] for s in ["Saturation", "Decline"]]
+    decline_probs = posteriors[:, decline_idx].sum(axis=1)
+    
     # Detect decline point
-    decline_info = detect_decline_point(df, state_sequence)
+    decline_info = detect_decline_point(df, state_sequence, decline_probs)
+    
+    # Alternative decline dates from the top-5 state sequences
+    decline_alternatives = alternative_decline_points(hmm, observations, k=5)
+    for alt in decline_alternatives:
+        alt["date"] = str(df.iloc[alt["index"]]["date"]) if alt["index"] is not None else None
     
     result = {
         "trend_name": trend_name,
@@ -146,12 +135,18 @@ def analyze_single_trend(
         },
         "decline_detected": decline_info["detected"],
         "decline_info": decline_info if decline_info["detected"] else None,
+        "decline_alternatives": decline_alternatives,
+        # Last day's state distribution; run() forecasts from it for all trends at once
+        "current_state_probabilities": {
+            state: float(posteriors[-1, i]) for i, state in enumerate(hmm.states)
+        },
+        "decline_forecast": None,
         "investigation_report": None
     }
     
     if decline_info["detected"]:
         print(f"\n⚠️ DECLINE DETECTED on {decline_info['date']}")
-        print(f"   State: {decline_info['state']}")
+        print(f"   State: {decline_info['state']} (p={decline_info['probability']:.2f})")
         print(f"   Velocity: {decline_info['metrics']['velocity']:.2f}")
         print(f"   Fatigue: {decline_info['metrics']['fatigue']:.2f}")
         print(f"   Retention: {decline_info['metrics']['retention']:.2f}")
@@ -182,12 +177,41 @@ def analyze_single_trend(
     return result
 
 
-def save_json_report(results: list, output_path: str):
-    """Save analysis results as JSON report."""
+def forecast_declines(results: list, forecaster: DeclineForecaster, horizon: int = 7) -> list:
+    """
+    Fill each result's decline_forecast from its last-day state distribution
+    and rank the trends by risk of decline within `horizon` days.
+    All trends are forecast in one vectorized pass.
+    """
+    if not results:
+        return []
+    
+    states = forecaster.model.states
+    names = [r["trend_name"] for r in results]
+    dists = np.array([
+        [r["current_state_probabilities"][s] for s in states] for r in results
+    ])
+    
+    p_7d = forecaster.reach_probability(dists, 7)
+    p_30d = forecaster.reach_probability(dists, 30)
+    days = forecaster.expected_days(dists)
+    for k, r in enumerate(results):
+        r["decline_forecast"] = {
+            "p_decline_7d": float(p_7d[k]),
+            "p_decline_30d": float(p_30d[k]),
+            "expected_days_to_decline": float(days[k])
+        }
+    
+    return forecaster.rank(names, dists, horizon=horizon)
+
+
+def save_json_report(results: list, output_path: str, risk_ranking: list = None):
+    """Save analysis results (and the decline risk ranking, if given) as JSON report."""
     report = {
         "generated_at": datetime.now().isoformat(),
         "total_trends_analyzed": len(results),
         "trends_with_decline": sum(1 for r in results if r["decline_detected"]),
+        "risk_ranking": risk_ranking or [],
         "trends": results
     }
     
@@ -241,8 +265,13 @@ def run():
     os.makedirs(REPORTS_DIR, exist_ok=True)
     
     # 1. Initialize HMM
-    print("\n📐 Initializing 5-state HMM...")
-    hmm = create_5state_hmm()
+    # Latest published model (train_hmm.py publishes trained versions)
+    print("\n📐 Loading 5-state HMM from model registry...")
+    hmm = registry.get_model()
+    print(f"   Version {hmm.version} ({hmm.model_hash[:12]})")
+    
+    # One forecaster for the whole run; its matrix powers are shared by all trends
+    forecaster = DeclineForecaster(hmm)
     
     # 2. Initialize AI Investigator
     print("🧠 Initializing AI Investigator...")
@@ -259,23 +288,37 @@ def run():
             print("❌ No data file found! Run data_generator_v2.py first.")
             return
     
-    df = pd.read_csv(data_file)
-    print(f"   Loaded {len(df)} records")
-    
-    # 4. Get unique trends
-    if "trend_name" in df.columns:
-        trends = df["trend_name"].unique()
+    if os.path.getsize(data_file) > STREAM_THRESHOLD_BYTES:
+        # 4-5. Large file: decode each trend as soon as the reader completes it
+        # (the input must be grouped by trend_name, as the generators write it)
+        print("   Large file - streaming trends while reading")
+        trends = (
+            (trend_name, trend_df, observations, None)
+            for trend_name, (trend_df, observations)
+            in iter_trends(data_file, features=hmm.features, grouped=True)
+        )
     else:
-        trends = ["Unknown Trend"]
-        df["trend_name"] = "Unknown Trend"
-    
-    print(f"   Found {len(trends)} unique trend(s)")
+        df = pd.read_csv(data_file)
+        print(f"   Loaded {len(df)} records")
+        
+        # 4. Index trends: one sort, then every trend is a contiguous slice
+        if "trend_name" not in df.columns:
+            df["trend_name"] = "Unknown Trend"
+        index = TrendIndex(df, hmm.features)
+        
+        print(f"   Found {len(index)} unique trend(s)")
+        
+        # 5. Decode all trends in one batch straight from the shared array
+        print(f"\n🧠 Running batched HMM inference on {len(index)} trend(s)...")
+        paths = viterbi_batch(hmm, index.values, index.offsets)
+        trends = (
+            (trend_name, index.frame(trend_name), index.observations(trend_name), path)
+            for trend_name, path in zip(index.names, paths)
+        )
     
-    # 5. Analyze each trend
+    # 6. Analyze each trend
     results = []
-    for trend_name in trends:
-        trend_df = df[df["trend_name"] == trend_name].copy()
-        
+    for trend_name, trend_df, observations, path in trends:
         # Skip if too few data points
         if len(trend_df) < 10:
             print(f"⏭️ Skipping {trend_name} - insufficient data ({len(trend_df)} days)")
@@ -285,20 +328,30 @@ def run():
             df=trend_df,
             trend_name=trend_name,
             hmm=hmm,
-            investigator=investigator
+            investigator=investigator,
+            state_sequence=[hmm.get_state_name(i) for i in path] if path is not None else None,
+            observations=observations
         )
         results.append(result)
     
-    # 6. Print executive summary
+    # 7. Forecast and rank decline risk across all trends
+    risk_ranking = forecast_declines(results, forecaster)
+    
+    # 8. Print executive summary
     print_executive_summary(results)
+    if risk_ranking:
+        print("\n🔮 HIGHEST DECLINE RISK (next 7 days):")
+        for entry in risk_ranking[:5]:
+            print(f"   {entry['trend_name']}: {entry['decline_probability']:.0%} "
+                  f"(~{entry['expected_days_to_decline']:.0f} days to decline)")
     
-    # 7. Save JSON report
+    # 9. Save JSON report
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     report_path = os.path.join(REPORTS_DIR, f"trend_report_{timestamp}.json")
-    save_json_report(results, report_path)
+    save_json_report(results, report_path, risk_ranking)
     print(f"\n💾 Full report saved to: {report_path}")
     
-    # 8. Print investigation for first declining trend
+    # 10. Print investigation for first declining trend
     declining = [r for r in results if r["decline_detected"]]
     if declining and declining[0].get("investigation_report"):
         print("\n")
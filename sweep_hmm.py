@@ -0,0 +1,106 @@
+"""
+TrendGuard HMM Model Sweep
+==========================
+Cross-validates candidate HMM configurations (state counts, covariance
+types, feature subsets) in parallel and reports held-out log-likelihood and
+decline-date accuracy against the archetype lifecycles of data_generator_v2.
+"""
+
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+from data_generator_v2 import TREND_ARCHETYPES
+from trendguard.hmm_engine.selection import expand_grid, run_sweep
+from trendguard.utils.data_loader import CORE_METRICS, EXTENDED_METRICS
+
+DEFAULT_DATA_FILE = os.path.join("data", "trends_dataset.csv")
+REPORTS_DIR = "reports"
+
+
+def expected_decline_day(archetype: str, days: int):
+    """Day the generator starts the post-peak decline for an archetype."""
+    config = TREND_ARCHETYPES.get(archetype)
+    if config is None:
+        return None
+    if config.get("cliff_event"):
+        return min(int(days * 0.5), int(days * config["peak_position"]))
+    return int(round(days * config["peak_position"]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel HMM model-selection sweep")
+    parser.add_argument("--data", type=str, default=DEFAULT_DATA_FILE, help="Trend CSV path")
+    parser.add_argument("--states", type=int, nargs="+", default=[3, 4, 5, 6], help="State counts to try")
+    parser.add_argument("--folds", type=int, default=3, help="Cross-validation folds")
+    parser.add_argument("--iterations", type=int, default=30, help="Max EM iterations per fit")
+    parser.add_argument("--tolerance", type=int, default=3, help="Decline-date tolerance in days")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args()
+    
+    print("🚀 TrendGuard HMM Model Sweep")
+    print("=" * 40)
+    
+    df = pd.read_csv(args.data)
+    # Offsets below assume each trend's rows are contiguous (and in date order)
+    df = df.sort_values([c for c in ("trend_name", "date") if c in df.columns], kind="stable")
+    
+    available = [m for m in CORE_METRICS + EXTENDED_METRICS if m in df.columns]
+    extended = [m for m in EXTENDED_METRICS if m in df.columns]
+    feature_sets = [
+        CORE_METRICS,
+        CORE_METRICS + [m for m in ["sentiment", "engagement_rate"] if m in df.columns],
+        CORE_METRICS + extended
+    ]
+    configs = expand_grid(n_states=args.states, feature_sets=feature_sets)
+    
+    # One contiguous matrix of every candidate feature, trends back to back
+    groups = df.groupby("trend_name", sort=False)
+    lengths = groups.size().values
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    observations = df[available].to_numpy(dtype=np.float64)
+    
+    targets = None
+    if "archetype" in df.columns:
+        archetypes = groups["archetype"].first().values
+        targets = [expected_decline_day(a, n) for a, n in zip(archetypes, lengths)]
+    
+    print(f"\n📂 {len(lengths)} trends, {len(observations)} days, {len(configs)} configurations")
+    print(f"🧠 Running {len(configs) * args.folds} fits on {args.jobs or os.cpu_count()} worker(s)...")
+    
+    results = run_sweep(
+        observations, offsets, available, configs,
+        decline_targets=targets, n_folds=args.folds, n_iter=args.iterations,
+        tolerance=args.tolerance, n_jobs=args.jobs
+    )
+    
+    # Results come grouped by feature set, ranked by held-out likelihood within
+    # each; across feature sets only decline accuracy is comparable
+    print(f"\n{'Rank':>4} {'States':>6} {'Cov':>5} {'LL/day':>9} {'Acc':>6} {'MAE':>6}")
+    for r in results:
+        if r["feature_set_rank"] == 1:
+            print(f"\n  Features: {', '.join(r['features'])}")
+        print(
+            f"{r['feature_set_rank']:>4} {r['n_states']:>6} {r['covariance_type']:>5} "
+            f"{r['log_likelihood_per_day']:>9.3f} "
+            f"{r.get('decline_accuracy', float('nan')):>6.2f} {r.get('decline_mae_days', float('nan')):>6.1f}"
+        )
+    
+    best = None
+    scored = [r for r in results if "decline_accuracy" in r]
+    if scored:
+        best = max(scored, key=lambda r: (r["decline_accuracy"], -r.get("decline_mae_days", 0.0)))
+        print(
+            f"\n🏆 Best decline accuracy: {best['n_states']} states, {best['covariance_type']} covariance, "
+            f"{len(best['features'])} features ({best['decline_accuracy']:.2f})"
+        )
+    
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    report_path = os.path.join(REPORTS_DIR, f"hmm_sweep_{timestamp}.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump({"generated_at": datetime.now().isoformat(), "best_by_decline_accuracy": best, "results": results}, f, indent=2)
+    print(f"\n💾 Sweep report saved to: {report_path}")
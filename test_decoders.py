@@ -0,0 +1,91 @@
+"""
+Test Script for HMM Decoders
+============================
+Sparse and dense transition handling must give the same decodes
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from trendguard.hmm_engine.hmm import HiddenMarkovModel
+from trendguard.hmm_engine.decoder import (
+    viterbi_log, viterbi_decode, viterbi_batch, viterbi_kbest, log_transition_matrix
+)
+from trendguard.hmm_engine.filtering import FixedLagViterbi
+
+
+def banded_model(n_states=20, seed=0):
+    """Left-to-right model where each state moves at most two states ahead."""
+    rng = np.random.default_rng(seed)
+    A = np.zeros((n_states, n_states))
+    for i in range(n_states):
+        for step, p in enumerate([0.7, 0.2, 0.1]):
+            if i + step < n_states:
+                A[i, i + step] = p
+    A /= A.sum(axis=1, keepdims=True)
+    return HiddenMarkovModel(
+        states=[f"S{i}" for i in range(n_states)],
+        emission_means=rng.normal(size=(n_states, 3)),
+        emission_covs=np.stack([np.eye(3)] * n_states),
+        transition_matrix=A,
+        initial_probs=np.full(n_states, 1.0 / n_states)
+    )
+
+
+def against_the_grain(model, seed=0):
+    """Observations that walk the states forward and then backward, 3 days each."""
+    order = list(range(model.n_states)) + list(range(model.n_states - 1, -1, -1))
+    means = np.asarray(model.emission_means)[np.repeat(order, 3)]
+    return means + 0.1 * np.random.default_rng(seed).normal(size=means.shape)
+
+
+def test_sparse_matches_dense():
+    """The transition structure changes decoding speed, not the result."""
+    model = banded_model()
+    assert model.transition_structure.is_sparse
+    observations = np.random.default_rng(1).normal(size=(200, 3))
+
+    log_pi = np.log(model.pi + 1e-10)
+    log_B = model.log_emission_matrix(observations)
+    sparse_path, sparse_score = viterbi_log(log_pi, np.log(model.A + 1e-10), log_B, model.transition_structure)
+    dense_path, dense_score = viterbi_log(log_pi, log_transition_matrix(model), log_B)
+
+    assert np.array_equal(sparse_path, dense_path)
+    assert np.isclose(sparse_score, dense_score)
+    assert np.all(np.diff(sparse_path) >= 0)
+
+
+def test_batch_matches_single():
+    model = banded_model()
+    rng = np.random.default_rng(2)
+    sequences = [rng.normal(size=(n, 3)) for n in (5, 40, 200)]
+    offsets = np.concatenate([[0], np.cumsum([len(s) for s in sequences])])
+
+    paths = viterbi_batch(model, np.concatenate(sequences), offsets)
+    for seq, path in zip(sequences, paths):
+        assert np.array_equal(path, viterbi_decode(model, seq)[0])
+
+
+def test_kbest_respects_structure():
+    """The top k-best path is the Viterbi path; no path takes a forbidden step."""
+    model = banded_model()
+    observations = against_the_grain(model, seed=3)
+
+    paths = viterbi_kbest(model, observations, k=5)
+    assert np.array_equal(paths[0][0], viterbi_decode(model, observations)[0])
+    for path, _ in paths:
+        assert model.transition_structure.allowed[path[:-1], path[1:]].all()
+
+
+def test_fixed_lag_matches_viterbi():
+    """With the whole history inside the lag window, the live path is the Viterbi path."""
+    model = banded_model()
+    observations = against_the_grain(model, seed=4)
+
+    tracker = FixedLagViterbi(model, lag=len(observations))
+    for obs in observations:
+        tracker.update("trend", obs)
+    assert tracker.provisional_states("trend") == viterbi_decode(model, observations)[1]
@@ -0,0 +1,62 @@
+"""
+TrendGuard HMM Trainer
+======================
+Learns the 5-state HMM parameters from the trend dataset with Baum-Welch
+and publishes them to the model registry for the pipeline and backend.
+"""
+
+import os
+import argparse
+import numpy as np
+
+from trendguard.hmm_engine import registry
+from trendguard.hmm_engine.training import expand_features
+from trendguard.utils.data_loader import load_multi_trend_data, CORE_METRICS
+
+DEFAULT_DATA_FILE = os.path.join("data", "trends_dataset.csv")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the TrendGuard HMM with Baum-Welch")
+    parser.add_argument("--data", type=str, default=DEFAULT_DATA_FILE, help="Training CSV path")
+    parser.add_argument("--name", type=str, default=registry.DEFAULT_MODEL_NAME, help="Registry model name")
+    parser.add_argument("--iterations", type=int, default=50, help="Maximum EM iterations")
+    parser.add_argument("--tol", type=float, default=1e-3, help="Log-likelihood convergence tolerance")
+    parser.add_argument("--jobs", type=int, default=None, help="E-step worker processes (default: all cores)")
+    parser.add_argument("--features", type=str, nargs="+", default=CORE_METRICS,
+                        help="Observation columns (core and/or extended metrics)")
+    parser.add_argument("--covariance-type", type=str, default="full", choices=["full", "diag"],
+                        help="Emission covariance type")
+    args = parser.parse_args()
+    
+    print("🚀 TrendGuard HMM Trainer")
+    print("=" * 40)
+    
+    print(f"\n📂 Loading {args.data}...")
+    trends = load_multi_trend_data(args.data, features=args.features)
+    sequences = [obs for _, obs in trends.values()]
+    print(f"   {len(sequences)} trends, {sum(len(s) for s in sequences)} days")
+    
+    # Baum-Welch needs complete observations; trends with gaps are left out
+    complete = [s for s in sequences if not np.isnan(s).any()]
+    if len(complete) < len(sequences):
+        print(f"   ⚠️ Skipping {len(sequences) - len(complete)} trend(s) with missing values")
+    if not complete:
+        raise SystemExit("❌ Every trend has missing values; impute or drop them before training")
+    sequences = complete
+    
+    # Hand-tuned parameters are the EM starting point
+    hmm = registry.default_5state_hmm()
+    if args.features != hmm.features or args.covariance_type != hmm.covariance_type:
+        hmm = expand_features(hmm, sequences, args.features, args.covariance_type)
+    print(f"   Features: {', '.join(hmm.features)} ({hmm.covariance_type} covariance)")
+    
+    print("\n🧠 Running Baum-Welch...")
+    history = hmm.fit(sequences, n_iter=args.iterations, tol=args.tol, n_jobs=args.jobs, verbose=True)
+    print(f"   Stopped after {len(history)} iterations (log-likelihood {history[-1]:.2f})")
+    
+    entry = registry.publish(hmm, args.name)
+    print(f"\n✅ Published {args.name} version {entry['version']} ({entry['hash'][:12]})")
+    
+    print("\n📐 Learned transition matrix:")
+    print(np.round(hmm.A, 3))
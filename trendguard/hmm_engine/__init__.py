@@ -0,0 +1,48 @@
+"""
+TrendGuard HMM Engine
+=====================
+Gaussian HMM model and decoders for trend lifecycle inference.
+"""
+
+from .hmm import HiddenMarkovModel, TransitionStructure
+from .filtering import ForwardFilter, FixedLagViterbi
+from .forecast import DeclineForecaster
+from .hsmm import HiddenSemiMarkovModel, segmental_viterbi
+from .result_cache import DecodeResultCache, frame_fingerprint
+
+from .decoder import (
+    viterbi_log,
+    viterbi_decode,
+    viterbi_gaussian,
+    viterbi_batch,
+    viterbi_kbest,
+    alternative_decline_points,
+    forward_log,
+    backward_log,
+    forward_scaled,
+    backward_scaled,
+    forward_backward
+)
+
+__all__ = [
+    'HiddenMarkovModel',
+    'TransitionStructure',
+    'ForwardFilter',
+    'FixedLagViterbi',
+    'DeclineForecaster',
+    'HiddenSemiMarkovModel',
+    'segmental_viterbi',
+    'DecodeResultCache',
+    'frame_fingerprint',
+    'viterbi_log',
+    'viterbi_decode',
+    'viterbi_gaussian',
+    'viterbi_batch',
+    'viterbi_kbest',
+    'alternative_decline_points',
+    'forward_log',
+    'backward_log',
+    'forward_scaled',
+    'backward_scaled',
+    'forward_backward'
+]
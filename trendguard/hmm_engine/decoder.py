@@ -1,38 +1,64 @@
 import numpy as np
 
-def viterbi_gaussian(model, observations):
+
+def _sparse(structure):
+    return structure is not None and structure.is_sparse
+
+
+def log_transition_matrix(model):
     """
-    Finds the most likely sequence of states for the given data.
+    log A with every transition outside model.transition_structure at -inf.
+    All decoders use this one convention, so a sparse structure only changes
+    their speed, never their output.
     """
-    T = observations.shape[0]
-    N = model.n_states
+    log_A = np.log(model.A + 1e-10)
+    return np.where(model.transition_structure.allowed, log_A, -np.inf)
+
+
+def viterbi_log(log_pi, log_A, log_B, structure=None):
+    """
+    Core Viterbi recursion in log space, vectorized over states.
+    
+    Args:
+        log_pi: (N,) log initial probabilities
+        log_A: (N, N) log transition matrix
+        log_B: (T, N) log emission matrix
+        structure: Optional TransitionStructure; transitions it does not
+            allow are excluded (-inf). When sparse, only allowed predecessors
+            are scored (O(N*k) per step instead of O(N^2))
+        
+    Returns:
+        Tuple of (path as int array of length T, log score of the best path)
+    """
+    T, N = log_B.shape
+    if structure is not None:
+        log_A = np.where(structure.allowed, log_A, -np.inf)
     
     # log_delta[t, i] = max probability of ending in state i at time t
-    log_delta = np.zeros((T, N))
+    log_delta = np.empty((T, N))
     psi = np.zeros((T, N), dtype=int)
+    cols = np.arange(N)
     
-    # 1. Initialization (Use Log to avoid underflow)
-    log_pi = np.log(model.pi + 1e-10)
-    
-    for i in range(N):
-        emit_p = model.emission_probability(observations[0], i)
-        log_delta[0, i] = log_pi[i] + np.log(emit_p + 1e-10)
+    # 1. Initialization
+    log_delta[0] = log_pi + log_B[0]
     
     # 2. Recursion
-    log_A = np.log(model.A + 1e-10)
+    if _sparse(structure):
+        # scores[j, k] = best path into the k-th allowed predecessor of j, then -> j
+        preds = structure.predecessors
+        log_A_pred = structure.gather_predecessors(log_A, fill=-np.inf)
+        for t in range(1, T):
+            scores = log_delta[t-1][preds] + log_A_pred
+            best = np.argmax(scores, axis=1)
+            psi[t] = preds[cols, best]
+            log_delta[t] = scores[cols, best] + log_B[t]
+    else:
+        # scores[i, j] = best path into i at t-1, then i -> j
+        for t in range(1, T):
+            scores = log_delta[t-1][:, None] + log_A
+            psi[t] = np.argmax(scores, axis=0)
+            log_delta[t] = scores[psi[t], cols] + log_B[t]
     
-    for t in range(1, T):
-        for j in range(N):
-            emit_p = np.log(model.emission_probability(observations[t], j) + 1e-10)
-            
-            # Find best transition from previous step
-            vals = []
-            for i in range(N):
-                vals.append(log_delta[t-1, i] + log_A[i, j])
-            
-            psi[t, j] = np.argmax(vals)
-            log_delta[t, j] = np.max(vals) + emit_p
-            
     # 3. Termination
     path = np.zeros(T, dtype=int)
     path[T-1] = np.argmax(log_delta[T-1])
@@ -40,5 +66,330 @@ def viterbi_gaussian(model, observations):
     # 4. Backtracking
     for t in range(T-2, -1, -1):
         path[t] = psi[t+1, path[t+1]]
+    
+    return path, float(log_delta[T-1, path[T-1]])
+
+
+def viterbi_decode(model, observations, missing=None):
+    """
+    Finds the most likely sequence of states for the given data.
+    NaNs (or True entries of `missing`) are marginalized out of the emissions.
+    
+    Returns:
+        Tuple of (state indices as int array, state names as list)
+    """
+    log_pi = np.log(model.pi + 1e-10)
+    log_A = log_transition_matrix(model)
+    log_B = model.log_emission_matrix(observations, missing)
+    
+    path, _ = viterbi_log(log_pi, log_A, log_B, model.transition_structure)
+    return path, [model.get_state_name(i) for i in path]
+
+
+def viterbi_gaussian(model, observations, missing=None):
+    """
+    Finds the most likely sequence of states for the given data.
+    """
+    _, names = viterbi_decode(model, observations, missing)
+    return names
+
+
+def viterbi_kbest(model, observations, k=5, missing=None):
+    """
+    Parallel list Viterbi: the k most likely state sequences.
+    
+    Each (t, state) keeps its k best partial paths. A step scores all
+    (predecessor, rank) candidates for every state at once and keeps the
+    top k of each column with one sort, so the cost is O(T * N^2 * k log(N*k)).
+    
+    Returns:
+        List of (state indices as int array, log score) pairs, best first
+        (fewer than k if fewer distinct paths exist)
+    """
+    log_pi = np.log(model.pi + 1e-10)
+    log_A = log_transition_matrix(model)
+    log_B = model.log_emission_matrix(observations, missing)
+    T, N = log_B.shape
+    
+    # log_delta[t, j, r] = score of the r-th best path ending in j at t
+    log_delta = np.full((T, N, k), -np.inf)
+    back_state = np.zeros((T, N, k), dtype=int)
+    back_rank = np.zeros((T, N, k), dtype=int)
+    log_delta[0, :, 0] = log_pi + log_B[0]
+    
+    for t in range(1, T):
+        # candidates[j, (i, r)] = r-th best path into i, then i -> j
+        candidates = (log_delta[t-1][None, :, :] + log_A.T[:, :, None]).reshape(N, N * k)
+        top = np.argsort(-candidates, axis=1, kind='stable')[:, :k]
         
-    return [model.get_state_name(i) for i in path]
\ No newline at end of file
+        log_delta[t] = np.take_along_axis(candidates, top, axis=1) + log_B[t][:, None]
+        back_state[t] = top // k
+        back_rank[t] = top % k
+    
+    # Best k complete paths over all (state, rank) endings
+    final = log_delta[T-1].reshape(-1)
+    ends = np.argsort(-final, kind='stable')[:k]
+    
+    ends = ends[np.isfinite(final[ends])]
+    
+    # Backtrack all k paths together
+    state, rank = ends // k, ends % k
+    paths = np.zeros((len(ends), T), dtype=int)
+    paths[:, T-1] = state
+    for t in range(T-1, 0, -1):
+        state, rank = back_state[t, state, rank], back_rank[t, state, rank]
+        paths[:, t-1] = state
+    
+    return [(paths[r], float(final[end])) for r, end in enumerate(ends)]
+
+
+def alternative_decline_points(model, observations, k=5, decline_states=("Saturation", "Decline"), missing=None):
+    """
+    First decline day under each of the k best state sequences.
+    
+    Returns:
+        List of dicts (rank, index, state, log_score, relative_likelihood),
+        best first; index/state are None for paths that never decline.
+        relative_likelihood is normalized over the k returned paths.
+    """
+    decline_idx = [model.state_to_idx[s] for s in decline_states if s in model.state_to_idx]
+    paths = viterbi_kbest(model, observations, k, missing)
+    if not paths:
+        return []
+    
+    scores = np.array([score for _, score in paths])
+    weights = np.exp(scores - scores.max())
+    weights /= weights.sum()
+    
+    alternatives = []
+    for rank, ((path, score), weight) in enumerate(zip(paths, weights), 1):
+        hits = np.nonzero(np.isin(path, decline_idx))[0]
+        index = int(hits[0]) if len(hits) else None
+        alternatives.append({
+            "rank": rank,
+            "index": index,
+            "state": model.get_state_name(path[index]) if index is not None else None,
+            "log_score": score,
+            "relative_likelihood": float(weight)
+        })
+    return alternatives
+
+
+def _logsumexp(x, axis):
+    """Numerically stable log(sum(exp(x))) that tolerates all -inf slices."""
+    m = np.max(x, axis=axis, keepdims=True)
+    m = np.where(np.isfinite(m), m, 0.0)
+    with np.errstate(divide='ignore'):
+        out = np.log(np.sum(np.exp(x - m), axis=axis, keepdims=True)) + m
+    return np.squeeze(out, axis=axis)
+
+
+def forward_log(log_pi, log_A, log_B, structure=None):
+    """
+    Forward pass in log space: log_alpha[t, i] = log P(o_1..o_t, s_t = i).
+    """
+    T, N = log_B.shape
+    log_alpha = np.empty((T, N))
+    log_alpha[0] = log_pi + log_B[0]
+    
+    if _sparse(structure):
+        preds = structure.predecessors
+        log_A_pred = structure.gather_predecessors(log_A, fill=-np.inf)
+        for t in range(1, T):
+            log_alpha[t] = _logsumexp(log_alpha[t-1][preds] + log_A_pred, axis=1) + log_B[t]
+        return log_alpha
+    
+    for t in range(1, T):
+        log_alpha[t] = _logsumexp(log_alpha[t-1][:, None] + log_A, axis=0) + log_B[t]
+    
+    return log_alpha
+
+
+def backward_log(log_A, log_B, structure=None):
+    """
+    Backward pass in log space: log_beta[t, i] = log P(o_t+1..o_T | s_t = i).
+    """
+    T, N = log_B.shape
+    log_beta = np.zeros((T, N))
+    
+    if _sparse(structure):
+        succs = structure.successors
+        log_A_succ = structure.gather_successors(log_A, fill=-np.inf)
+        for t in range(T-2, -1, -1):
+            log_beta[t] = _logsumexp(log_A_succ + (log_B[t+1] + log_beta[t+1])[succs], axis=1)
+        return log_beta
+    
+    for t in range(T-2, -1, -1):
+        log_beta[t] = _logsumexp(log_A + (log_B[t+1] + log_beta[t+1])[None, :], axis=1)
+    
+    return log_beta
+
+
+def forward_scaled(pi, A, B, structure=None):
+    """
+    Scaled forward pass (Rabiner): each alpha[t] is normalized to sum to 1
+    and the normalizers are returned as scales[t].
+    
+    Args:
+        pi: (N,) initial probabilities
+        A: (N, N) transition matrix
+        B: (T, N) emission likelihoods (may be rescaled per row)
+        structure: Optional TransitionStructure for sparse transitions
+    """
+    T, N = B.shape
+    alpha = np.empty((T, N))
+    scales = np.empty(T)
+    
+    sparse = _sparse(structure)
+    if sparse:
+        preds = structure.predecessors
+        A_pred = structure.gather_predecessors(A)
+    
+    a = pi * B[0]
+    for t in range(T):
+        if t > 0:
+            if sparse:
+                a = np.sum(alpha[t-1][preds] * A_pred, axis=1) * B[t]
+            else:
+                a = (alpha[t-1] @ A) * B[t]
+        scales[t] = a.sum()
+        alpha[t] = a / scales[t] if scales[t] > 0 else a
+    
+    return alpha, scales
+
+
+def backward_scaled(A, B, scales, structure=None):
+    """
+    Scaled backward pass matching forward_scaled's normalizers.
+    """
+    T, N = B.shape
+    beta = np.ones((T, N))
+    
+    if _sparse(structure):
+        succs = structure.successors
+        A_succ = structure.gather_successors(A)
+        for t in range(T-2, -1, -1):
+            beta[t] = np.sum(A_succ * (B[t+1] * beta[t+1])[succs], axis=1) / scales[t+1]
+        return beta
+    
+    for t in range(T-2, -1, -1):
+        beta[t] = (A @ (B[t+1] * beta[t+1])) / scales[t+1]
+    
+    return beta
+
+
+def forward_backward(model, observations, missing=None):
+    """
+    Computes per-day state probabilities for the given data.
+    NaNs (or True entries of `missing`) are marginalized out of the emissions.
+    
+    Returns:
+        Tuple of (T x N posterior marginals, sequence log-likelihood)
+    """
+    log_B = model.log_emission_matrix(observations, missing)
+    structure = model.transition_structure
+    
+    # Rescale emissions per day so the probability-space recursion cannot underflow
+    row_max = log_B.max(axis=1, keepdims=True)
+    B = np.exp(log_B - row_max)
+    
+    with np.errstate(all='ignore'):
+        alpha, scales = forward_scaled(model.pi, model.A, B, structure)
+        beta = backward_scaled(model.A, B, scales, structure)
+        posteriors = alpha * beta
+    
+    if np.all(scales > 0) and np.all(np.isfinite(posteriors)):
+        log_likelihood = float(np.sum(np.log(scales)) + np.sum(row_max))
+        return posteriors, log_likelihood
+    
+    # Scaling broke down on extreme observations: redo in log space
+    with np.errstate(divide='ignore'):
+        log_pi = np.log(model.pi)
+        log_A = np.log(model.A)
+    
+    log_alpha = forward_log(log_pi, log_A, log_B, structure)
+    log_beta = backward_log(log_A, log_B, structure)
+    log_likelihood = float(_logsumexp(log_alpha[-1], axis=0))
+    
+    posteriors = np.exp(log_alpha + log_beta - log_likelihood)
+    return posteriors, log_likelihood
+
+
+def viterbi_batch(model, observations, offsets, batch_size=1024, missing=None):
+    """
+    Decodes many trends at once from one concatenated observation array.
+    Sequences are length-sorted, padded into (B, T_max, N) blocks and run
+    through the recursion together; padded steps are masked out.
+    
+    Args:
+        observations: (sum(T_b), D) observations of all trends back to back
+        offsets: (B + 1,) boundaries, trend b is observations[offsets[b]:offsets[b+1]]
+        batch_size: Max trends decoded together (bounds padded block memory)
+        missing: Optional mask like observations; NaNs are treated as missing too
+        
+    Returns:
+        List of B int arrays with the state indices of each trend
+    """
+    offsets = np.asarray(offsets, dtype=int)
+    lengths = np.diff(offsets)
+    n_trends = len(lengths)
+    N = model.n_states
+    
+    log_pi = np.log(model.pi + 1e-10)
+    log_A = log_transition_matrix(model)
+    log_B_all = model.log_emission_matrix(observations, missing)
+    
+    structure = model.transition_structure
+    sparse = _sparse(structure)
+    if sparse:
+        preds = structure.predecessors
+        log_A_pred = structure.gather_predecessors(log_A, fill=-np.inf)
+        cols = np.arange(N)[None, :]
+    
+    paths = [np.zeros(0, dtype=int) for _ in range(n_trends)]
+    
+    # Similar lengths in the same block keep padding small
+    order = [b for b in np.argsort(lengths, kind='stable') if lengths[b] > 0]
+    
+    for start in range(0, len(order), batch_size):
+        block = np.array(order[start:start + batch_size])
+        B = len(block)
+        block_len = lengths[block]
+        T_max = int(block_len.max())
+        rows = np.arange(B)
+        
+        # Gather (B, T_max, N) emissions; padded steps repeat the last row
+        steps = np.minimum(np.arange(T_max)[None, :], block_len[:, None] - 1)
+        log_B = log_B_all[offsets[block][:, None] + steps]
+        
+        psi = np.zeros((B, T_max, N), dtype=int)
+        log_delta = log_pi[None, :] + log_B[:, 0]
+        
+        for t in range(1, T_max):
+            if sparse:
+                # scores[b, j, k]: k-th allowed predecessor of j
+                scores = log_delta[:, preds] + log_A_pred[None, :, :]
+                best = np.argmax(scores, axis=2)
+                psi[:, t] = preds[cols, best]
+                new_delta = np.take_along_axis(scores, best[:, :, None], axis=2)[:, :, 0] + log_B[:, t]
+            else:
+                scores = log_delta[:, :, None] + log_A[None, :, :]
+                psi[:, t] = np.argmax(scores, axis=1)
+                new_delta = np.take_along_axis(scores, psi[:, t][:, None, :], axis=1)[:, 0] + log_B[:, t]
+            
+            # Finished sequences keep their final delta
+            active = t < block_len
+            log_delta = np.where(active[:, None], new_delta, log_delta)
+        
+        # Backtrack all sequences together, each from its own last step
+        state = np.argmax(log_delta, axis=1)
+        block_paths = np.zeros((B, T_max), dtype=int)
+        for t in range(T_max - 1, -1, -1):
+            stepping = t < block_len - 1
+            state = np.where(stepping, psi[rows, np.minimum(t + 1, T_max - 1), state], state)
+            block_paths[:, t] = state
+        
+        for row, b in enumerate(block):
+            paths[b] = block_paths[row, :block_len[row]]
+    
+    return paths
@@ -0,0 +1,266 @@
+"""
+Online Forward Filter
+=====================
+Incremental state estimation for streaming daily metrics. Each tracked trend
+keeps only its current filtered distribution, so a new day costs O(N^2)
+instead of re-decoding the whole history.
+"""
+
+import numpy as np
+
+from .decoder import log_transition_matrix
+
+DECLINE_STATES = ("Saturation", "Decline")
+
+
+class ForwardFilter:
+    """
+    Keeps P(state_t | observations_1..t) for a watchlist of trends.
+    """
+    def __init__(self, model, decline_states=DECLINE_STATES):
+        self.model = model
+        self.decline_idx = [model.state_to_idx[s] for s in decline_states if s in model.state_to_idx]
+
+        N = model.n_states
+        self._index = {}
+        self._alpha = np.zeros((16, N))
+        self._log_likelihood = np.zeros(16)
+        self._n_obs = np.zeros(16, dtype=int)
+
+        with np.errstate(divide='ignore'):
+            self._log_pi = np.log(model.pi)
+
+    @property
+    def trends(self):
+        return list(self._index)
+
+    def _rows(self, trend_names):
+        rows = []
+        for name in trend_names:
+            row = self._index.get(name)
+            if row is None:
+                row = len(self._index)
+                if row == len(self._alpha):
+                    # Double capacity so adding trends stays amortized O(1)
+                    self._alpha = np.concatenate([self._alpha, np.zeros_like(self._alpha)])
+                    self._log_likelihood = np.concatenate([self._log_likelihood, np.zeros_like(self._log_likelihood)])
+                    self._n_obs = np.concatenate([self._n_obs, np.zeros_like(self._n_obs)])
+                self._index[name] = row
+            rows.append(row)
+        return np.array(rows, dtype=int)
+
+    def update(self, trend_name, observation):
+        """
+        Absorb one new day of metrics for a trend.
+
+        Returns:
+            Updated (N,) state distribution
+        """
+        return self.update_batch([trend_name], np.atleast_2d(observation))[0]
+
+    def update_batch(self, trend_names, observations):
+        """
+        Absorb one new day for many trends at once (names must be unique).
+
+        Args:
+            trend_names: K trend names
+            observations: (K, D) metrics for the new day, row per trend
+
+        Returns:
+            (K, N) updated state distributions
+        """
+        rows = self._rows(trend_names)
+        log_B = self.model.log_emission_matrix(observations)
+
+        # Predict: first day uses the initial distribution, later days step through A
+        started = self._n_obs[rows] > 0
+        with np.errstate(divide='ignore'):
+            log_prior = np.where(
+                started[:, None],
+                np.log(self._alpha[rows] @ self.model.A),
+                self._log_pi[None, :]
+            )
+
+        # Correct with the new emissions, normalized in log space
+        log_post = log_prior + log_B
+        m = np.max(log_post, axis=1, keepdims=True)
+        finite = np.isfinite(m[:, 0])
+        m = np.where(np.isfinite(m), m, 0.0)
+        post = np.exp(log_post - m)
+        total = post.sum(axis=1, keepdims=True)
+
+        # An observation impossible under every reachable state leaves the prior in place
+        with np.errstate(divide='ignore', invalid='ignore'):
+            post = np.where(finite[:, None], post / total, np.exp(log_prior))
+
+        self._alpha[rows] = post
+        self._log_likelihood[rows] += np.where(finite, np.log(total[:, 0]) + m[:, 0], 0.0)
+        self._n_obs[rows] += 1
+        return post
+
+    def state_distribution(self, trend_name):
+        """Current filtered distribution over states for a trend."""
+        row = self._index[trend_name]
+        if self._n_obs[row] == 0:
+            return np.asarray(self.model.pi, dtype=float).copy()
+        return self._alpha[row].copy()
+
+    def state_distributions(self):
+        """
+        Filtered distributions of every tracked trend.
+
+        Returns:
+            Tuple of (trend names, (K, N) distributions in the same order)
+        """
+        n = len(self._index)
+        dists = self._alpha[:n].copy()
+        dists[self._n_obs[:n] == 0] = self.model.pi
+        return list(self._index), dists
+
+    def current_state(self, trend_name):
+        """Most probable current state name."""
+        return self.model.get_state_name(int(np.argmax(self.state_distribution(trend_name))))
+
+    def decline_probability(self, trend_name=None):
+        """
+        Probability of currently being in Saturation/Decline.
+        With no trend_name, returns a dict for every tracked trend.
+        """
+        if trend_name is not None:
+            return float(self.state_distribution(trend_name)[self.decline_idx].sum())
+
+        n = len(self._index)
+        probs = self._alpha[:n, self.decline_idx].sum(axis=1)
+        probs = np.where(self._n_obs[:n] > 0, probs, np.sum(self.model.pi[self.decline_idx]))
+        return {name: float(probs[row]) for name, row in self._index.items()}
+
+    def log_likelihood(self, trend_name):
+        """Log-likelihood of all observations absorbed so far for a trend."""
+        return float(self._log_likelihood[self._index[trend_name]])
+
+    def reset(self, trend_name):
+        """Forget a trend's history; its next update starts from pi."""
+        row = self._index.get(trend_name)
+        if row is not None:
+            self._alpha[row] = 0.0
+            self._log_likelihood[row] = 0.0
+            self._n_obs[row] = 0
+
+
+class FixedLagViterbi:
+    """
+    Sliding-window Viterbi for live state labels on a watchlist of trends.
+
+    Each trend keeps its current Viterbi scores plus an L x N ring buffer of
+    backpointers. After absorbing day t, the label for day t - L is read off
+    the current best path and committed; it is never revised afterwards.
+    Memory and per-update work are bounded by L regardless of history length.
+    """
+    def __init__(self, model, lag=14):
+        if lag < 1:
+            raise ValueError("lag must be at least 1")
+        self.model = model
+        self.lag = lag
+
+        N = model.n_states
+        self._index = {}
+        self._log_delta = np.zeros((16, N))
+        self._psi = np.zeros((16, lag, N), dtype=np.int32)
+        self._n_obs = np.zeros(16, dtype=int)
+
+        self._log_pi = np.log(model.pi + 1e-10)
+        self._log_A = log_transition_matrix(model)
+
+    @property
+    def trends(self):
+        return list(self._index)
+
+    def _rows(self, trend_names):
+        rows = []
+        for name in trend_names:
+            row = self._index.get(name)
+            if row is None:
+                row = len(self._index)
+                if row == len(self._log_delta):
+                    self._log_delta = np.concatenate([self._log_delta, np.zeros_like(self._log_delta)])
+                    self._psi = np.concatenate([self._psi, np.zeros_like(self._psi)])
+                    self._n_obs = np.concatenate([self._n_obs, np.zeros_like(self._n_obs)])
+                self._index[name] = row
+            rows.append(row)
+        return np.array(rows, dtype=int)
+
+    def _backtrack(self, rows, steps):
+        """Follow each row's backpointers `steps` days back from its best final state."""
+        state = np.argmax(self._log_delta[rows], axis=1)
+        t = self._n_obs[rows] - 1
+        path = np.zeros((len(rows), steps), dtype=int)
+        for k in range(steps):
+            path[:, steps - 1 - k] = state
+            if k < steps - 1:
+                state = self._psi[rows, t % self.lag, state]
+                t = t - 1
+        return path, state
+
+    def update(self, trend_name, observation):
+        """
+        Absorb one new day for a trend.
+
+        Returns:
+            Committed state name for the day `lag` steps back, or None while
+            fewer than lag + 1 days have been seen
+        """
+        return self.update_batch([trend_name], np.atleast_2d(observation))[0]
+
+    def update_batch(self, trend_names, observations):
+        """
+        Absorb one new day for many trends at once (names must be unique).
+
+        Returns:
+            List of committed state names (or None), one per trend
+        """
+        rows = self._rows(trend_names)
+        log_B = self.model.log_emission_matrix(observations)
+        started = self._n_obs[rows] > 0
+
+        scores = self._log_delta[rows][:, :, None] + self._log_A[None, :, :]
+        psi = np.argmax(scores, axis=1)
+        best = np.take_along_axis(scores, psi[:, None, :], axis=1)[:, 0]
+        log_delta = np.where(started[:, None], best, self._log_pi[None, :]) + log_B
+
+        # Shift scores so they stay bounded on long-running trends
+        self._log_delta[rows] = log_delta - log_delta.max(axis=1, keepdims=True)
+        self._psi[rows, self._n_obs[rows] % self.lag] = psi
+        self._n_obs[rows] += 1
+
+        committed = [None] * len(rows)
+        ready = np.nonzero(self._n_obs[rows] > self.lag)[0]
+        if len(ready):
+            # Walking back lag pointers from day t lands on day t - lag
+            _, state = self._backtrack(rows[ready], self.lag)
+            state = self._psi[rows[ready], (self._n_obs[rows[ready]] - self.lag) % self.lag, state]
+            for k, s in zip(ready, state):
+                committed[k] = self.model.get_state_name(int(s))
+        return committed
+
+    def provisional_states(self, trend_name):
+        """
+        Current best labels for the most recent, not yet committed days
+        (up to `lag` of them, oldest first). These may still change.
+        """
+        row = self._index[trend_name]
+        steps = int(min(self._n_obs[row], self.lag))
+        if steps == 0:
+            return []
+        path, _ = self._backtrack(np.array([row]), steps)
+        return [self.model.get_state_name(int(s)) for s in path[0]]
+
+    def n_observations(self, trend_name):
+        """Number of days absorbed for a trend."""
+        return int(self._n_obs[self._index[trend_name]])
+
+    def reset(self, trend_name):
+        """Forget a trend's history."""
+        row = self._index.get(trend_name)
+        if row is not None:
+            self._log_delta[row] = 0.0
+            self._n_obs[row] = 0
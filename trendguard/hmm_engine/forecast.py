@@ -0,0 +1,118 @@
+"""
+Decline Forecasting
+===================
+Forward-looking decline risk from the current state distribution of each
+trend, using cached transition matrix powers and the fundamental matrix of
+the absorbing chain. All methods are vectorized over trends.
+"""
+
+import numpy as np
+
+
+class DeclineForecaster:
+    """
+    Probability of reaching the target (decline) states within 1..H days and
+    expected days until reaching them, for many trends at once.
+    """
+    def __init__(self, model, target_states=("Decline",), max_horizon=30):
+        self.model = model
+        self.max_horizon = max_horizon
+
+        N = model.n_states
+        self.target_idx = np.array([model.state_to_idx[s] for s in target_states])
+        self.transient_idx = np.setdiff1d(np.arange(N), self.target_idx)
+
+        # Treat the targets as absorbing so "in target at h" means "reached by h"
+        A = np.array(model.A, dtype=float)
+        A[self.target_idx] = 0.0
+        A[self.target_idx, self.target_idx] = 1.0
+        self.absorbing_A = A
+
+        # reach_by_horizon[h-1, i] = P(reached target within h steps | state i now)
+        target_mask = np.zeros(N)
+        target_mask[self.target_idx] = 1.0
+        reach = np.empty((max_horizon, N))
+        power = np.eye(N)
+        for h in range(max_horizon):
+            power = power @ A
+            reach[h] = power @ target_mask
+        self.reach_by_horizon = reach
+
+        self.expected_steps = self._expected_steps()
+
+    def _expected_steps(self):
+        """
+        Expected steps to absorption per state via the fundamental matrix.
+        Infinite for states that may never be absorbed: those that cannot
+        reach a target, and those that can but may also fall into a closed
+        class of states that never reaches one.
+        """
+        N = self.model.n_states
+        steps = np.zeros(N)
+        transient = self.transient_idx
+        if len(transient) == 0:
+            return steps
+
+        Q = self.absorbing_A[np.ix_(transient, transient)]
+
+        # States that can never reach a target have infinite expected time
+        R = self.absorbing_A[np.ix_(transient, self.target_idx)].sum(axis=1)
+        reachable = R > 0
+        for _ in range(len(transient)):
+            reachable = reachable | ((Q > 0) & reachable[None, :]).any(axis=1)
+
+        steps[transient] = np.inf
+        if reachable.any():
+            sub = np.ix_(reachable, reachable)
+            fundamental = np.linalg.inv(np.eye(reachable.sum()) - Q[sub])
+            # Mass leaking to unreachable states is excluded from Q[sub], so
+            # absorption probabilities below 1 reveal it
+            absorbed = fundamental @ R[reachable]
+            expected = fundamental.sum(axis=1)
+            steps[transient[reachable]] = np.where(absorbed > 1.0 - 1e-9, expected, np.inf)
+        return steps
+
+    def reach_probability(self, distributions, horizon=None):
+        """
+        Args:
+            distributions: (K, N) current state distributions (or a single (N,))
+            horizon: Single horizon in days; default returns all 1..max_horizon
+
+        Returns:
+            (K, H) probabilities of having reached the targets by each horizon,
+            or (K,) for a single horizon
+        """
+        p = np.atleast_2d(distributions)
+        if horizon is None:
+            return p @ self.reach_by_horizon.T
+        if not 1 <= horizon <= self.max_horizon:
+            raise ValueError(f"horizon must be between 1 and {self.max_horizon}")
+        return p @ self.reach_by_horizon[horizon - 1]
+
+    def expected_days(self, distributions):
+        """(K,) expected days until the targets are reached (0 if already there)."""
+        p = np.atleast_2d(distributions)
+        with np.errstate(invalid='ignore'):
+            days = p @ np.where(np.isinf(self.expected_steps), 0.0, self.expected_steps)
+        # Any mass on a state that may never decline makes the expectation infinite
+        never = (p[:, np.isinf(self.expected_steps)] > 0).any(axis=1)
+        return np.where(never, np.inf, days)
+
+    def rank(self, trend_names, distributions, horizon=7):
+        """
+        Rank trends by probability of reaching decline within `horizon` days.
+
+        Returns:
+            List of dicts sorted from most to least at risk
+        """
+        probs = self.reach_probability(distributions, horizon)
+        days = self.expected_days(distributions)
+        order = np.argsort(-probs, kind='stable')
+        return [
+            {
+                "trend_name": trend_names[k],
+                "decline_probability": float(probs[k]),
+                "expected_days_to_decline": float(days[k])
+            }
+            for k in order
+        ]
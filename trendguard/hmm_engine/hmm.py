@@ -1,15 +1,96 @@
 import numpy as np
-from scipy.stats import multivariate_normal
+
+# Added to covariance diagonals to prevent singular matrix errors
+COV_REGULARIZATION = 1e-6
+
+# Observation columns used when a model does not name its own features
+DEFAULT_FEATURES = ['velocity', 'fatigue', 'retention']
+
+COVARIANCE_TYPES = ('full', 'diag')
+
+
+def _index_table(allowed):
+    """
+    Padded per-row column indices of the True entries of `allowed`.
+    Padding repeats a valid index and is flagged False in the mask.
+    """
+    n_rows = allowed.shape[0]
+    width = max(int(allowed.sum(axis=1).max()), 1)
+    idx = np.zeros((n_rows, width), dtype=int)
+    mask = np.zeros((n_rows, width), dtype=bool)
+    for r in range(n_rows):
+        cols = np.nonzero(allowed[r])[0]
+        if len(cols) == 0:
+            cols = np.array([r])
+        else:
+            mask[r, :len(cols)] = True
+        idx[r, :len(cols)] = cols
+        idx[r, len(cols):] = cols[0]
+    return idx, mask
+
+
+class TransitionStructure:
+    """
+    Allowed transitions of an HMM as padded predecessor/successor tables.
+    Decoders use them to visit only the k allowed neighbours of each state,
+    costing O(N*k) per step instead of O(N^2).
+    """
+    def __init__(self, allowed):
+        self.allowed = np.asarray(allowed, dtype=bool)
+        self.n_states = self.allowed.shape[0]
+        
+        # predecessors[j] = states i with i -> j allowed
+        self.predecessors, self.predecessor_mask = _index_table(self.allowed.T)
+        # successors[i] = states j with i -> j allowed
+        self.successors, self.successor_mask = _index_table(self.allowed)
+        
+        self.max_in_degree = self.predecessors.shape[1]
+        self.max_out_degree = self.successors.shape[1]
+
+    @property
+    def is_sparse(self):
+        # Gathering only pays off over dense broadcasting when most pairs are excluded
+        return max(self.max_in_degree, self.max_out_degree) * 2 <= self.n_states
+
+    def gather_predecessors(self, M, fill=0.0):
+        """(N, k) values M[predecessors[j, k], j]; padding set to `fill`."""
+        cols = np.arange(self.n_states)[:, None]
+        return np.where(self.predecessor_mask, M[self.predecessors, cols], fill)
+
+    def gather_successors(self, M, fill=0.0):
+        """(N, k) values M[i, successors[i, k]]; padding set to `fill`."""
+        rows = np.arange(self.n_states)[:, None]
+        return np.where(self.successor_mask, M[rows, self.successors], fill)
+
 
 class HiddenMarkovModel:
     """
-    Gaussian HMM for continuous 3D observations:
+    Gaussian HMM for continuous observations, by default 3D:
     [Velocity, Fatigue, Retention]
+    
+    `features` names the observation columns (any subset of core + extended
+    metrics). With covariance_type='diag' emissions use a diagonal-covariance
+    kernel whose cost grows linearly with the number of features; emission_covs
+    may then be (N, D) variances or (N, D, D) matrices (off-diagonals ignored).
     """
-    def __init__(self, states, emission_means, emission_covs, transition_matrix=None, initial_probs=None):
+    def __init__(self, states, emission_means, emission_covs, transition_matrix=None, initial_probs=None,
+                 allowed_transitions=None, features=None, covariance_type='full'):
+        if covariance_type not in COVARIANCE_TYPES:
+            raise ValueError(f"covariance_type must be one of {COVARIANCE_TYPES}")
+        
         self.states = states
         self.n_states = len(states)
         self.state_to_idx = {s: i for i, s in enumerate(states)}
+        self.covariance_type = covariance_type
+        self.features = list(features) if features is not None else list(DEFAULT_FEATURES)
+        
+        if len(self.features) != np.shape(emission_means)[1]:
+            raise ValueError(
+                f"{len(self.features)} features but emission means have {np.shape(emission_means)[1]} dimensions"
+            )
+        
+        # Optional explicit sparsity pattern; otherwise derived from A's non-zeros
+        self.allowed_transitions = allowed_transitions
         
         # Transition Matrix (Default: Flow from Growth -> Saturation -> Decline)
         self.A = transition_matrix if transition_matrix is not None else np.array([
@@ -24,12 +105,231 @@ class HiddenMarkovModel:
         # Start in Growth
         self.pi = initial_probs if initial_probs is not None else np.array([1.0, 0.0, 0.0])
 
+    def __setattr__(self, name, value):
+        if self.__dict__.get("_frozen", False):
+            raise AttributeError(
+                f"Model is read-only (shared registry instance); cannot set '{name}'. "
+                "Modify or fit a copy() instead"
+            )
+        super().__setattr__(name, value)
+
+    def freeze(self):
+        """
+        Make the model read-only: attributes cannot be reassigned and its
+        arrays cannot be written. Used for shared instances whose hash
+        identifies their parameters.
+        """
+        for value in self.__dict__.values():
+            if isinstance(value, np.ndarray):
+                value.setflags(write=False)
+        self._frozen = True
+        return self
+
+    def copy(self):
+        """Independent, writable copy of the model's parameters."""
+        return type(self).from_arrays({k: np.array(v) for k, v in self.to_arrays().items()})
+
+    @property
+    def A(self):
+        return self._A
+
+    @A.setter
+    def A(self, transition_matrix):
+        self._A = transition_matrix
+        allowed = self.allowed_transitions
+        if allowed is None:
+            allowed = np.asarray(transition_matrix) > 0
+        self.transition_structure = TransitionStructure(allowed)
+
+    @property
+    def emission_covs(self):
+        return self._emission_covs
+
+    @emission_covs.setter
+    def emission_covs(self, covs):
+        # Factorize once here instead of on every emission evaluation
+        self._emission_covs = covs
+        covs = np.asarray(covs, dtype=float)
+        
+        if self.covariance_type == 'diag':
+            variances = covs if covs.ndim == 2 else np.diagonal(covs, axis1=1, axis2=2)
+            variances = variances + COV_REGULARIZATION
+            
+            # No factorization needed: the Cholesky factor is just the std-devs
+            self.inv_vars = 1.0 / variances
+            self.cov_cholesky = np.sqrt(variances)[:, :, None] * np.eye(variances.shape[1])
+            self.inv_covs = self.inv_vars[:, :, None] * np.eye(variances.shape[1])
+            self.log_dets = np.sum(np.log(variances), axis=1)
+            return
+        
+        safe_covs = covs + np.eye(covs.shape[-1]) * COV_REGULARIZATION
+        
+        self.cov_cholesky = np.linalg.cholesky(safe_covs)
+        self.inv_covs = np.linalg.inv(safe_covs)
+        self.log_dets = 2.0 * np.sum(
+            np.log(np.diagonal(self.cov_cholesky, axis1=1, axis2=2)), axis=1
+        )
+
+    def log_emission_matrix(self, observations, missing=None):
+        """
+        Log Gaussian density of every observation under every state.
+        
+        Missing values (NaN, or True in `missing`) are marginalized out: each
+        day is scored on its observed dimensions only, and a fully missing day
+        contributes log 1 = 0 for every state.
+        
+        Args:
+            observations: (T, D) observation matrix
+            missing: Optional (T, D) boolean mask of missing entries
+            
+        Returns:
+            (T, N) matrix of log emission probabilities
+        """
+        observations = np.atleast_2d(np.asarray(observations, dtype=float))
+        means = np.asarray(self.emission_means, dtype=float)
+        
+        if missing is None:
+            missing = np.isnan(observations)
+        else:
+            missing = np.atleast_2d(np.asarray(missing, dtype=bool)) | np.isnan(observations)
+        if missing.any():
+            return self._log_emission_missing(observations, means, missing)
+        
+        if self.covariance_type == 'diag':
+            # sum_d (x - mu)^2 / var expanded into three O(T*N*D) matrix products
+            mahalanobis = (
+                (observations ** 2) @ self.inv_vars.T
+                - 2.0 * observations @ (means * self.inv_vars).T
+                + np.sum(means ** 2 * self.inv_vars, axis=1)
+            )
+        else:
+            diff = observations[:, None, :] - means[None, :, :]
+            mahalanobis = np.einsum('tnd,nde,tne->tn', diff, self.inv_covs, diff)
+        
+        dim = means.shape[1]
+        return -0.5 * (dim * np.log(2 * np.pi) + self.log_dets + mahalanobis)
+
+    def _log_emission_missing(self, observations, means, missing):
+        """log_emission_matrix for data with gaps (marginal Gaussians)."""
+        observed = ~missing
+        x = np.where(observed, observations, 0.0)
+        dim = observed.sum(axis=1)
+        
+        if self.covariance_type == 'diag':
+            # Masked terms drop out of every sum, so this stays three matrix products
+            w = observed.astype(float)
+            mahalanobis = (
+                (x ** 2) @ self.inv_vars.T
+                - 2.0 * x @ (means * self.inv_vars).T
+                + w @ (means ** 2 * self.inv_vars).T
+            )
+            log_dets = w @ np.log(1.0 / self.inv_vars).T
+            return -0.5 * (dim[:, None] * np.log(2 * np.pi) + log_dets + mahalanobis)
+        
+        # Full covariance: one marginal factorization per distinct gap pattern
+        T, N = observations.shape[0], self.n_states
+        safe_covs = self.cov_cholesky @ np.swapaxes(self.cov_cholesky, 1, 2)
+        patterns, pattern_of_row = np.unique(observed, axis=0, return_inverse=True)
+        pattern_of_row = np.reshape(pattern_of_row, -1)
+        
+        log_B = np.zeros((T, N))
+        for p, keep in enumerate(patterns):
+            rows = np.nonzero(pattern_of_row == p)[0]
+            if not keep.any():
+                continue
+            if keep.all():
+                inv_covs, log_dets = self.inv_covs, self.log_dets
+            else:
+                sub_covs = safe_covs[:, keep][:, :, keep]
+                inv_covs = np.linalg.inv(sub_covs)
+                log_dets = np.linalg.slogdet(sub_covs)[1]
+            
+            diff = observations[rows][:, keep][:, None, :] - means[None, :, keep]
+            mahalanobis = np.einsum('tnd,nde,tne->tn', diff, inv_covs, diff)
+            log_B[rows] = -0.5 * (keep.sum() * np.log(2 * np.pi) + log_dets + mahalanobis)
+        return log_B
+
     def emission_probability(self, observation, state_idx):
-        mean = self.emission_means[state_idx]
-        cov = self.emission_covs[state_idx]
-        # Add small noise to cov to prevent singular matrix errors
-        safe_cov = cov + np.eye(len(mean)) * 1e-6
-        return multivariate_normal.pdf(observation, mean=mean, cov=safe_cov)
+        return float(np.exp(self.log_emission_matrix(observation)[0, state_idx]))
 
     def get_state_name(self, idx):
-        return self.states[idx]
\ No newline at end of file
+        return self.states[idx]
+
+    def fit(self, sequences, n_iter=50, tol=1e-3, n_jobs=None, verbose=False):
+        """
+        Learn pi, A and the emission parameters with Baum-Welch EM.
+        The current parameters are the starting point; zero transitions stay zero.
+        
+        Args:
+            sequences: List of (T, D) observation arrays, one per trend
+            n_iter: Maximum EM iterations
+            tol: Log-likelihood improvement below which training stops
+            n_jobs: E-step worker processes (default: all cores, 1 = inline)
+            verbose: Print progress per iteration
+            
+        Returns:
+            List of total log-likelihoods per iteration
+        """
+        from .training import baum_welch
+        return baum_welch(self, sequences, n_iter=n_iter, tol=tol, n_jobs=n_jobs, verbose=verbose)
+
+    def to_arrays(self):
+        """
+        Parameters plus the cached covariance factorizations as a dict of arrays.
+        """
+        arrays = {
+            "states": np.array(self.states),
+            "emission_means": np.asarray(self.emission_means, dtype=float),
+            "emission_covs": np.asarray(self.emission_covs, dtype=float),
+            "transition_matrix": np.asarray(self.A, dtype=float),
+            "initial_probs": np.asarray(self.pi, dtype=float),
+            "cov_cholesky": self.cov_cholesky,
+            "inv_covs": self.inv_covs,
+            "log_dets": self.log_dets,
+            "features": np.array(self.features),
+            "covariance_type": np.array(self.covariance_type)
+        }
+        if self.allowed_transitions is not None:
+            arrays["allowed_transitions"] = np.asarray(self.allowed_transitions, dtype=bool)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """
+        Rebuild a model from to_arrays() output, reusing the stored
+        factorizations instead of recomputing them.
+        """
+        keys = set(arrays)
+        model = cls.__new__(cls)
+        model.states = [str(s) for s in arrays["states"]]
+        model.n_states = len(model.states)
+        model.state_to_idx = {s: i for i, s in enumerate(model.states)}
+        model.covariance_type = str(arrays["covariance_type"][()]) if "covariance_type" in keys else 'full'
+        model.features = (
+            [str(f) for f in arrays["features"]] if "features" in keys else list(DEFAULT_FEATURES)
+        )
+        model.allowed_transitions = arrays["allowed_transitions"] if "allowed_transitions" in keys else None
+        model.A = arrays["transition_matrix"]
+        model.emission_means = arrays["emission_means"]
+        model.pi = arrays["initial_probs"]
+        
+        if {"cov_cholesky", "inv_covs", "log_dets"} <= keys:
+            model._emission_covs = arrays["emission_covs"]
+            model.cov_cholesky = arrays["cov_cholesky"]
+            model.inv_covs = arrays["inv_covs"]
+            model.log_dets = arrays["log_dets"]
+            if model.covariance_type == 'diag':
+                model.inv_vars = np.diagonal(model.inv_covs, axis1=1, axis2=2)
+        else:
+            model.emission_covs = arrays["emission_covs"]
+        return model
+
+    def save(self, path):
+        """Save model parameters to an .npz file."""
+        np.savez(path, **self.to_arrays())
+
+    @classmethod
+    def load(cls, path):
+        """Load a model saved with save()."""
+        with np.load(path) as data:
+            return cls.from_arrays({key: data[key] for key in data.files})
@@ -0,0 +1,157 @@
+"""
+Hidden Semi-Markov Model
+========================
+HMM variant with explicit per-state phase durations. Self-transitions are
+replaced by a duration distribution over 1..D days, which removes the
+flickering and geometric phase lengths of the plain HMM. Decoding is a
+segmental Viterbi costing O(T * N * (D + N)).
+"""
+
+import numpy as np
+from scipy.stats import poisson
+
+from .hmm import HiddenMarkovModel
+
+
+def shifted_poisson_durations(mean_durations, max_duration):
+    """
+    (N, D) duration pmfs over 1..D days: 1 + Poisson(mean - 1), truncated at D.
+    """
+    mean_durations = np.clip(np.asarray(mean_durations, dtype=float), 1.0, None)
+    days = np.arange(max_duration)
+    pmf = poisson.pmf(days[None, :], mean_durations[:, None] - 1.0)
+    pmf[mean_durations == 1.0] = np.eye(1, max_duration)[0]
+    return pmf / pmf.sum(axis=1, keepdims=True)
+
+
+class HiddenSemiMarkovModel(HiddenMarkovModel):
+    """
+    Gaussian HSMM: same emissions as HiddenMarkovModel, plus duration_probs[j, d-1]
+    = P(a phase in state j lasts d days), d = 1..max_duration.
+
+    The transition matrix describes moves between phases; self-transitions are
+    dropped except for absorbing states, which may chain segments so they can
+    last longer than max_duration.
+    """
+    def __init__(self, states, emission_means, emission_covs, duration_probs,
+                 transition_matrix=None, initial_probs=None, features=None, covariance_type='full'):
+        super().__init__(states, emission_means, emission_covs, transition_matrix, initial_probs,
+                         features=features, covariance_type=covariance_type)
+
+        A = np.array(self.A, dtype=float)
+        absorbing = np.isclose(np.diag(A), 1.0)
+        A[np.diag_indices_from(A)] = np.where(absorbing, 1.0, 0.0)
+        row_sums = A.sum(axis=1, keepdims=True)
+        self.A = np.divide(A, row_sums, out=np.zeros_like(A), where=row_sums > 0)
+
+        self.duration_probs = np.asarray(duration_probs, dtype=float)
+        self.max_duration = self.duration_probs.shape[1]
+
+    @classmethod
+    def from_hmm(cls, hmm, max_duration=30, mean_durations=None):
+        """
+        Build an HSMM from an HMM. Mean phase lengths default to the HMM's
+        geometric expectation 1 / (1 - a_jj), capped at max_duration.
+        """
+        A = np.asarray(hmm.A, dtype=float)
+        if mean_durations is None:
+            stay = np.clip(np.diag(A), 0.0, 1.0 - 1.0 / max_duration)
+            mean_durations = 1.0 / (1.0 - stay)
+
+        return cls(
+            states=hmm.states,
+            emission_means=hmm.emission_means,
+            emission_covs=hmm.emission_covs,
+            duration_probs=shifted_poisson_durations(mean_durations, max_duration),
+            transition_matrix=A,
+            initial_probs=hmm.pi,
+            features=hmm.features,
+            covariance_type=hmm.covariance_type
+        )
+
+
+def segmental_viterbi(model, observations):
+    """
+    Most likely segmentation of the data into phases.
+
+    The last phase is treated as still running (right-censored), so its
+    duration is scored with P(duration >= d) rather than P(duration = d).
+
+    Returns:
+        Tuple of (state indices as int array, list of segment dicts with
+        state, start, end (inclusive) and length)
+    """
+    log_B = model.log_emission_matrix(observations)
+    T, N = log_B.shape
+    D = model.max_duration
+
+    with np.errstate(divide='ignore'):
+        log_pi = np.log(model.pi)
+        log_A = np.log(model.A)
+        log_dur = np.log(model.duration_probs)
+        survival = np.cumsum(model.duration_probs[:, ::-1], axis=1)[:, ::-1]
+        log_surv = np.log(survival)
+
+    # cum[t, j] = sum of log emissions of state j over days 0..t-1
+    cum = np.zeros((T + 1, N))
+    np.cumsum(log_B, axis=0, out=cum[1:])
+
+    # enter[s, j] = best score of a segmentation of days 0..s-1 followed by a
+    # new phase in state j starting on day s; prev[s, j] is the phase before it
+    enter = np.full((T + 1, N), -np.inf)
+    prev = np.full((T + 1, N), -1, dtype=int)
+    enter[0] = log_pi
+
+    # end[t, j] = best score with a phase in state j ending on day t-1
+    end = np.full((T + 1, N), -np.inf)
+    best_len = np.zeros((T + 1, N), dtype=int)
+
+    durations = np.arange(1, D + 1)
+    for t in range(1, T + 1):
+        d = durations[durations <= t]
+        starts = t - d
+        dur_scores = log_surv if t == T else log_dur
+        scores = enter[starts] + dur_scores[:, d - 1].T + (cum[t] - cum[starts])
+        k = np.argmax(scores, axis=0)
+        end[t] = scores[k, np.arange(N)]
+        best_len[t] = d[k]
+
+        if t < T:
+            trans = end[t][:, None] + log_A
+            prev[t] = np.argmax(trans, axis=0)
+            enter[t] = trans[prev[t], np.arange(N)]
+
+    # Backtrack segments from the end
+    segments = []
+    state = int(np.argmax(end[T]))
+    t = T
+    while t > 0:
+        length = int(best_len[t, state])
+        start = t - length
+        segments.append({
+            "state": model.get_state_name(state),
+            "start": start,
+            "end": t - 1,
+            "length": length
+        })
+        if start > 0:
+            state = int(prev[start, state])
+        t = start
+    segments.reverse()
+
+    # Absorbing phases longer than D are decoded as chained segments; report
+    # each run of one state as a single phase
+    merged = []
+    for seg in segments:
+        if merged and merged[-1]["state"] == seg["state"]:
+            merged[-1]["end"] = seg["end"]
+            merged[-1]["length"] += seg["length"]
+        else:
+            merged.append(seg)
+    segments = merged
+
+    path = np.repeat(
+        [model.state_to_idx[s["state"]] for s in segments],
+        [s["length"] for s in segments]
+    )
+    return path, segments
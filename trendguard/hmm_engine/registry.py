@@ -0,0 +1,252 @@
+"""
+Model Registry
+==============
+Versioned, content-hashed HMM artifacts shared by the pipeline and backend.
+
+Each published model is an uncompressed .npz (parameters plus precomputed
+Cholesky factors) named by its content hash, with a small JSON manifest per
+model name listing versions. Loading memory-maps the arrays straight out of
+the archive, so every worker maps the same file through the OS page cache.
+"""
+
+import os
+import json
+import uuid
+import zipfile
+import hashlib
+import numpy as np
+from datetime import datetime
+
+from .hmm import HiddenMarkovModel
+
+ARTIFACT_FORMAT = 1
+DEFAULT_MODEL_NAME = "hmm_5state"
+MODELS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "models"
+)
+
+# Parameters that define a model; caches are excluded from the hash
+_HASHED_KEYS = [
+    "states", "emission_means", "emission_covs",
+    "transition_matrix", "initial_probs", "allowed_transitions",
+    "features", "covariance_type"
+]
+
+# Per-process cache of loaded models: (name, version) -> model
+_loaded = {}
+
+
+def default_5state_hmm():
+    """
+    Hand-tuned 5-state HMM for trend lifecycle detection.
+    States: Emerging → Growth → Peak → Saturation → Decline
+    """
+    states = ["Emerging", "Growth", "Peak", "Saturation", "Decline"]
+    
+    # Emission means for each state [velocity, fatigue, retention]
+    emission_means = np.array([
+        [0.3, 0.1, 0.4],   # Emerging: Low velocity (building), low fatigue, moderate retention
+        [0.8, 0.2, 0.8],   # Growth: High velocity, low fatigue, high retention
+        [0.9, 0.4, 0.9],   # Peak: Maximum velocity, rising fatigue, maximum retention
+        [0.5, 0.6, 0.6],   # Saturation: Dropping velocity, high fatigue, dropping retention
+        [0.2, 0.8, 0.3]    # Decline: Low velocity, very high fatigue, low retention
+    ])
+    
+    # Covariance matrices (tighter = more confident)
+    emission_covs = np.array([
+        np.eye(3) * 0.08,  # Emerging
+        np.eye(3) * 0.05,  # Growth
+        np.eye(3) * 0.04,  # Peak (tight - distinctive)
+        np.eye(3) * 0.08,  # Saturation
+        np.eye(3) * 0.10   # Decline (looser - various patterns)
+    ])
+    
+    # Transition matrix: Generally flows forward, but can skip states
+    transition_matrix = np.array([
+        # Em    Gr    Pk    Sat   Dec
+        [0.6,  0.35, 0.05, 0.0,  0.0 ],  # Emerging → mostly Growth
+        [0.0,  0.5,  0.45, 0.05, 0.0 ],  # Growth → Peak
+        [0.0,  0.0,  0.4,  0.5,  0.1 ],  # Peak → Saturation (or quick decline)
+        [0.0,  0.0,  0.0,  0.5,  0.5 ],  # Saturation → Decline
+        [0.0,  0.0,  0.0,  0.0,  1.0 ]   # Decline → Decline (absorbing)
+    ])
+    
+    # Start in Emerging state
+    initial_probs = np.array([0.8, 0.2, 0.0, 0.0, 0.0])
+    
+    return HiddenMarkovModel(
+        states=states,
+        emission_means=emission_means,
+        emission_covs=emission_covs,
+        transition_matrix=transition_matrix,
+        initial_probs=initial_probs
+    )
+
+
+def model_hash(model):
+    """SHA-256 over the model's defining parameters."""
+    arrays = model.to_arrays()
+    digest = hashlib.sha256(f"trendguard-hmm-v{ARTIFACT_FORMAT}".encode())
+    for key in _HASHED_KEYS:
+        if key not in arrays:
+            continue
+        value = np.ascontiguousarray(arrays[key])
+        if value.dtype.kind == "U":
+            value = np.array("\x00".join(np.atleast_1d(value).tolist()))
+        digest.update(key.encode())
+        digest.update(str(value.shape).encode())
+        digest.update(value.tobytes())
+    return digest.hexdigest()
+
+
+def _manifest_path(name, models_dir):
+    return os.path.join(models_dir, f"{name}.json")
+
+
+def _read_manifest(name, models_dir):
+    path = _manifest_path(name, models_dir)
+    if not os.path.exists(path):
+        return {"name": name, "latest": None, "versions": []}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _mkstemp(directory, suffix=".tmp"):
+    """
+    Like tempfile.mkstemp, but created with the usual 0666 & ~umask mode
+    instead of 0600, so the renamed file is readable by other users (e.g. a
+    backend running under a different account).
+    """
+    while True:
+        tmp = os.path.join(directory, f"tmp{uuid.uuid4().hex}{suffix}")
+        try:
+            return os.open(tmp, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o666), tmp
+        except FileExistsError:
+            continue
+
+
+def _atomic_write(path, write):
+    """Write via a temp file + rename so concurrent readers never see partial files."""
+    directory = os.path.dirname(path)
+    fd, tmp = _mkstemp(directory)
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def publish(model, name=DEFAULT_MODEL_NAME, models_dir=MODELS_DIR):
+    """
+    Store a model as a new version (a no-op if identical parameters exist).
+
+    Returns:
+        Manifest entry dict with version, hash, file and created_at
+    """
+    os.makedirs(models_dir, exist_ok=True)
+    digest = model_hash(model)
+    manifest = _read_manifest(name, models_dir)
+
+    for entry in manifest["versions"]:
+        if entry["hash"] == digest:
+            return entry
+
+    filename = f"{name}-{digest[:16]}.npz"
+    arrays = model.to_arrays()
+
+    def write_artifact(tmp):
+        # Uncompressed so members can be memory-mapped in place
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+
+    _atomic_write(os.path.join(models_dir, filename), write_artifact)
+
+    entry = {
+        "version": len(manifest["versions"]) + 1,
+        "hash": digest,
+        "file": filename,
+        "format": ARTIFACT_FORMAT,
+        "created_at": datetime.now().isoformat()
+    }
+    manifest["versions"].append(entry)
+    manifest["latest"] = entry["version"]
+
+    def write_manifest(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+    _atomic_write(_manifest_path(name, models_dir), write_manifest)
+    return entry
+
+
+def _mmap_npz(path):
+    """Memory-map every member of an uncompressed .npz archive."""
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            key = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if info.compress_type != zipfile.ZIP_STORED:
+                arrays[key] = np.load(archive.open(info))
+                continue
+
+            # Local file header: 30 fixed bytes + name + extra field
+            f.seek(info.header_offset + 26)
+            name_len, extra_len = np.frombuffer(f.read(4), dtype="<u2")
+            data_start = info.header_offset + 30 + int(name_len) + int(extra_len)
+
+            f.seek(data_start)
+            major, _ = np.lib.format.read_magic(f)
+            if major == 1:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject or np.prod(shape) == 0:
+                arrays[key] = np.load(archive.open(info))
+                continue
+
+            arrays[key] = np.memmap(
+                path, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                order="F" if fortran_order else "C"
+            )
+    return arrays
+
+
+def load(name=DEFAULT_MODEL_NAME, version=None, models_dir=MODELS_DIR):
+    """
+    Load a published model (latest version by default), memory-mapped and
+    cached per process. The model gets `model_hash` and `version` attributes
+    and is read-only, since it is shared and its hash must keep matching its
+    parameters; use model.copy() to modify or retrain it.
+
+    Raises:
+        FileNotFoundError: If no such model/version has been published
+    """
+    manifest = _read_manifest(name, models_dir)
+    version = version or manifest["latest"]
+    entry = next((e for e in manifest["versions"] if e["version"] == version), None)
+    if entry is None:
+        raise FileNotFoundError(f"Model '{name}' version {version} not found in {models_dir}")
+
+    key = (os.path.abspath(models_dir), name, entry["version"])
+    if key not in _loaded:
+        model = HiddenMarkovModel.from_arrays(_mmap_npz(os.path.join(models_dir, entry["file"])))
+        model.model_hash = entry["hash"]
+        model.version = entry["version"]
+        _loaded[key] = model.freeze()
+    return _loaded[key]
+
+
+def get_model(name=DEFAULT_MODEL_NAME, models_dir=MODELS_DIR):
+    """
+    Latest published model; the default 5-state model is published on first use.
+    """
+    try:
+        return load(name, models_dir=models_dir)
+    except FileNotFoundError:
+        if name != DEFAULT_MODEL_NAME:
+            raise
+    publish(default_5state_hmm(), name, models_dir)
+    return load(name, models_dir=models_dir)
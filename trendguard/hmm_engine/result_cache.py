@@ -0,0 +1,106 @@
+"""
+Decode Result Cache
+===================
+Memoizes per-trend analysis payloads (state sequences, decline info,
+lifecycle data) by (trend, content fingerprint of its rows, model hash).
+Entries live in an in-memory LRU and optionally as JSON files on disk so
+they survive restarts. A change to the trend's rows or to the model gives a
+new key, so stale entries are never served; they just age out.
+"""
+
+import os
+import json
+import hashlib
+import threading
+import pandas as pd
+from collections import OrderedDict
+
+from .registry import _mkstemp
+
+
+def frame_fingerprint(df, columns=None):
+    """Content hash of a DataFrame's rows (selected columns, in order)."""
+    columns = list(columns) if columns is not None else list(df.columns)
+    row_hashes = pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+    digest = hashlib.sha256(row_hashes.tobytes())
+    digest.update("\x1f".join(columns).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class DecodeResultCache:
+    """
+    LRU cache of JSON-serializable analysis payloads.
+
+    Cached payloads are shared between callers and must not be mutated.
+    Safe to use from several threads.
+    """
+    def __init__(self, max_entries=256, cache_dir=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(trend_name, fingerprint, model_hash):
+        return hashlib.sha256(f"{trend_name}\x1f{fingerprint}\x1f{model_hash}".encode("utf-8")).hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        """Cached payload or None."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        payload = None
+        if self.cache_dir and os.path.exists(self._file(key)):
+            try:
+                with open(self._file(key), encoding="utf-8") as f:
+                    payload = json.load(f)
+            except (OSError, ValueError):
+                payload = None
+
+        with self._lock:
+            if payload is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._insert(key, payload)
+        return payload
+
+    def put(self, key, payload):
+        with self._lock:
+            self._insert(key, payload)
+
+        if self.cache_dir:
+            # Temp file + rename so concurrent readers never see partial JSON
+            fd, tmp = _mkstemp(self.cache_dir)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(payload, f)
+                os.replace(tmp, self._file(key))
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+    def _insert(self, key, payload):
+        self._entries[key] = payload
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop in-memory entries (disk entries stay valid and are reloaded on use)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
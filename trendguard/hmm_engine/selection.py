@@ -0,0 +1,262 @@
+"""
+Model Selection
+===============
+Parallel cross-validated sweep over HMM configurations (state count,
+covariance type, feature subset). The observation matrix is placed in shared
+memory once; pool workers map it zero-copy and only receive small task tuples.
+"""
+
+import os
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from .hmm import HiddenMarkovModel
+from .decoder import forward_backward, viterbi_decode
+from .training import expand_features, nan_moments, baum_welch_indexed
+from .registry import default_5state_hmm
+
+DECLINE_STATES = ("Saturation", "Decline")
+
+# Shared observation store, attached once per worker
+_shm = None
+_worker_data = None
+
+
+def state_names(n_states):
+    """Lifecycle state names for a model size."""
+    if n_states == 5:
+        return ["Emerging", "Growth", "Peak", "Saturation", "Decline"]
+    if n_states == 3:
+        return ["Growth", "Saturation", "Decline"]
+    return [f"State{i}" for i in range(n_states)]
+
+
+def decline_state_indices(model):
+    """Saturation/Decline if the model names them, otherwise its last two states."""
+    named = [model.state_to_idx[s] for s in DECLINE_STATES if s in model.state_to_idx]
+    return named or list(range(max(model.n_states - 2, 0), model.n_states))
+
+
+def left_to_right_init(sequences, n_states, features, covariance_type='full'):
+    """
+    Starting model for a left-to-right HMM of any size: each sequence is cut
+    into n_states equal time slices and slice k seeds state k's Gaussian.
+    """
+    D = len(features)
+
+    def time_slice(seq, k):
+        bounds = np.linspace(0, len(seq), n_states + 1).astype(int)
+        return seq[bounds[k]:bounds[k + 1]]
+
+    # Moments are accumulated per sequence, so the data is never concatenated
+    pooled_mean, pooled_var, _ = nan_moments(sequences)
+    means = np.empty((n_states, D))
+    variances = np.empty((n_states, D))
+    for k in range(n_states):
+        mean, variance, n_rows = nan_moments(time_slice(seq, k) for seq in sequences)
+        if n_rows < 2:
+            mean, variance = pooled_mean, pooled_var
+        means[k] = mean
+        variances[k] = variance + 1e-4
+
+    A = np.zeros((n_states, n_states))
+    for k in range(n_states - 1):
+        A[k, k], A[k, k + 1] = 0.7, 0.3
+    A[-1, -1] = 1.0
+    pi = np.eye(1, n_states)[0]
+
+    covs = variances if covariance_type == 'diag' else variances[:, :, None] * np.eye(D)
+    return HiddenMarkovModel(
+        states=state_names(n_states),
+        emission_means=means,
+        emission_covs=covs,
+        transition_matrix=A,
+        initial_probs=pi,
+        features=features,
+        covariance_type=covariance_type
+    )
+
+
+def initial_model(config, sequences):
+    """Hand-tuned 5-state parameters where they apply, else a generic left-to-right init."""
+    if config["n_states"] == 5:
+        return expand_features(default_5state_hmm(), sequences, config["features"], config["covariance_type"])
+    return left_to_right_init(sequences, config["n_states"], config["features"], config["covariance_type"])
+
+
+def evaluate(model, sequences, decline_targets=None, tolerance=3):
+    """
+    Held-out metrics for a trained model.
+
+    Args:
+        sequences: List of (T_b, D) observation arrays
+        decline_targets: Optional expected decline day per sequence (or None entries)
+        tolerance: Days within which a detected decline counts as correct
+
+    Returns:
+        Dict with log-likelihood per day and, with targets, decline accuracy / MAE
+    """
+    total_ll, total_days = 0.0, 0
+    errors = []
+    decline_idx = decline_state_indices(model)
+
+    for b, seq in enumerate(sequences):
+        _, ll = forward_backward(model, seq)
+        total_ll += ll
+        total_days += len(seq)
+
+        if decline_targets is None or decline_targets[b] is None:
+            continue
+        path, _ = viterbi_decode(model, seq)
+        hits = np.nonzero(np.isin(path, decline_idx))[0]
+        detected = hits[0] if len(hits) else len(seq)
+        errors.append(abs(int(detected) - int(decline_targets[b])))
+
+    result = {"log_likelihood_per_day": total_ll / max(total_days, 1)}
+    if errors:
+        errors = np.array(errors)
+        result["decline_accuracy"] = float(np.mean(errors <= tolerance))
+        result["decline_mae_days"] = float(np.mean(errors))
+    return result
+
+
+def expand_grid(n_states=(3, 4, 5, 6), covariance_types=("full", "diag"), feature_sets=None):
+    """All combinations of the given options as config dicts."""
+    feature_sets = feature_sets or [["velocity", "fatigue", "retention"]]
+    return [
+        {"n_states": n, "covariance_type": c, "features": list(f)}
+        for n, c, f in itertools.product(n_states, covariance_types, feature_sets)
+    ]
+
+
+def _init_worker(shm_name, shape, dtype, offsets, feature_names, decline_targets):
+    global _shm, _worker_data
+    _shm = shared_memory.SharedMemory(name=shm_name)
+    observations = np.ndarray(shape, dtype=dtype, buffer=_shm.buf)
+    _worker_data = {
+        "observations": observations,
+        "offsets": offsets,
+        "columns": {f: i for i, f in enumerate(feature_names)},
+        "decline_targets": decline_targets
+    }
+
+
+class _TrendViews:
+    """
+    Lazy per-trend sequences over the shared observations: item i is trend
+    indices[i] with the selected columns, materialized only while in use.
+    """
+    def __init__(self, indices, columns):
+        self.indices = indices
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, i):
+        offsets = _worker_data["offsets"]
+        b = self.indices[i]
+        return _worker_data["observations"][offsets[b]:offsets[b + 1], self.columns]
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+def _run_task(task):
+    config_id, config, fold, train_idx, test_idx, n_iter, tolerance = task
+    data = _worker_data
+    cols = [data["columns"][f] for f in config["features"]]
+    train = _TrendViews(train_idx, cols)
+
+    # EM reads the training trends straight out of shared memory, one batch at a time
+    model = initial_model(config, train)
+    history = baum_welch_indexed(
+        model, data["observations"], data["offsets"],
+        trends=train_idx, columns=cols, n_iter=n_iter, n_jobs=1
+    )
+
+    targets = data["decline_targets"]
+    metrics = evaluate(
+        model, _TrendViews(test_idx, cols),
+        decline_targets=[targets[b] for b in test_idx] if targets is not None else None,
+        tolerance=tolerance
+    )
+    metrics.update({"config_id": config_id, "fold": fold, "train_iterations": len(history)})
+    return metrics
+
+
+def run_sweep(observations, offsets, feature_names, configs, decline_targets=None,
+              n_folds=3, n_iter=30, tolerance=3, n_jobs=None, seed=0):
+    """
+    Train and cross-validate every config across a process pool.
+
+    Args:
+        observations: (sum(T_b), F) float array holding every candidate feature
+        offsets: (B + 1,) trend boundaries into observations
+        feature_names: Column names of observations
+        configs: List of dicts with n_states, covariance_type and features
+        decline_targets: Optional expected decline day per trend
+        n_folds: Cross-validation folds over trends
+        n_iter: Max Baum-Welch iterations per fit
+        tolerance: Days within which a decline date counts as correct
+        n_jobs: Worker processes (default: all cores)
+        seed: Fold shuffling seed
+
+    Returns:
+        One dict per config with fold-averaged metrics, grouped by feature
+        set (in config order) and, within a set, best held-out log-likelihood
+        first with its feature_set_rank. Likelihoods of different feature
+        sets are densities over different spaces and are not compared.
+    """
+    observations = np.ascontiguousarray(observations, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=int)
+    n_trends = len(offsets) - 1
+    n_folds = max(2, min(n_folds, n_trends))
+
+    order = np.random.default_rng(seed).permutation(n_trends)
+    folds = np.array_split(order, n_folds)
+
+    tasks = []
+    for config_id, config in enumerate(configs):
+        for fold, test_idx in enumerate(folds):
+            train_idx = np.setdiff1d(order, test_idx)
+            tasks.append((config_id, config, fold, train_idx, test_idx, n_iter, tolerance))
+
+    shm = shared_memory.SharedMemory(create=True, size=max(observations.nbytes, 1))
+    try:
+        np.ndarray(observations.shape, dtype=observations.dtype, buffer=shm.buf)[:] = observations
+        n_jobs = n_jobs or os.cpu_count() or 1
+        with ProcessPoolExecutor(
+            max_workers=n_jobs,
+            initializer=_init_worker,
+            initargs=(shm.name, observations.shape, observations.dtype, offsets,
+                      list(feature_names), decline_targets)
+        ) as pool:
+            fold_results = list(pool.map(_run_task, tasks))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    results = []
+    for config_id, config in enumerate(configs):
+        runs = [r for r in fold_results if r["config_id"] == config_id]
+        summary = {**config, "folds": len(runs)}
+        for key in ("log_likelihood_per_day", "decline_accuracy", "decline_mae_days"):
+            values = [r[key] for r in runs if key in r]
+            if values:
+                summary[key] = float(np.mean(values))
+        results.append(summary)
+
+    by_features = {}
+    for summary in results:
+        by_features.setdefault(tuple(summary["features"]), []).append(summary)
+
+    ranked = []
+    for group in by_features.values():
+        group.sort(key=lambda r: r["log_likelihood_per_day"], reverse=True)
+        for rank, summary in enumerate(group, 1):
+            summary["feature_set_rank"] = rank
+        ranked.extend(group)
+    return ranked
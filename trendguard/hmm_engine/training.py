@@ -0,0 +1,364 @@
+"""
+Baum-Welch Training
+===================
+EM estimation of HiddenMarkovModel parameters over many trend sequences.
+The E-step runs batched across trends and is split over a process pool;
+each worker returns sufficient statistics that are summed with NumPy.
+"""
+
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from .hmm import HiddenMarkovModel
+
+# Observations shared with pool workers (set once by the initializer)
+_worker_observations = None
+_worker_offsets = None
+_worker_columns = None
+
+
+def _init_worker(observations, offsets, columns):
+    global _worker_observations, _worker_offsets, _worker_columns
+    _worker_observations = observations
+    _worker_offsets = offsets
+    _worker_columns = columns
+
+
+def sufficient_statistics(pi, A, means, inv_covs, log_dets, observations, offsets, batch_size=512,
+                          trends=None, columns=None):
+    """
+    E-step for a group of sequences, batched over trends with length masking.
+
+    Only the padded rows of the current batch are gathered, so observations
+    may be a large shared array of which a subset of trends and columns is used.
+
+    Args:
+        pi, A: Current initial / transition probabilities
+        means, inv_covs, log_dets: Current emission parameters
+        observations: (sum(T_b), F) concatenated observations
+        offsets: (B + 1,) sequence boundaries into observations
+        batch_size: Max sequences processed together
+        trends: Optional indices of the sequences to use (default: all)
+        columns: Optional indices of the D observation columns to use
+
+    Returns:
+        Dict of summed statistics: start, trans, occupancy, obs_sum,
+        obs_outer, log_likelihood and n_sequences
+    """
+    N, D = means.shape
+    offsets = np.asarray(offsets, dtype=int)
+    starts, lengths = offsets[:-1], np.diff(offsets)
+    if trends is not None:
+        trends = np.asarray(trends, dtype=int)
+        starts, lengths = starts[trends], lengths[trends]
+
+    stats = {
+        "start": np.zeros(N),
+        "trans": np.zeros((N, N)),
+        "occupancy": np.zeros(N),
+        "obs_sum": np.zeros((N, D)),
+        "obs_outer": np.zeros((N, D, D)),
+        "log_likelihood": 0.0,
+        "n_sequences": 0
+    }
+
+    order = [b for b in np.argsort(lengths, kind='stable') if lengths[b] > 0]
+
+    for start in range(0, len(order), batch_size):
+        block = np.array(order[start:start + batch_size])
+        block_len = lengths[block]
+        T_max = int(block_len.max())
+
+        steps = np.minimum(np.arange(T_max)[None, :], block_len[:, None] - 1)
+        rows = starts[block][:, None] + steps
+        if columns is None:
+            obs = observations[rows]                                    # (b, T, D)
+        else:
+            obs = observations[rows[:, :, None], columns]
+        mask = np.arange(T_max)[None, :] < block_len[:, None]        # (b, T)
+
+        diff = obs[:, :, None, :] - means[None, None, :, :]
+        projected = np.matmul(diff.transpose(2, 0, 1, 3), inv_covs[:, None, :, :])
+        mahalanobis = np.sum(projected.transpose(1, 2, 0, 3) * diff, axis=3)
+        log_B = -0.5 * (D * np.log(2 * np.pi) + log_dets + mahalanobis)
+
+        row_max = log_B.max(axis=2, keepdims=True)
+        B = np.exp(log_B - row_max)
+
+        with np.errstate(all='ignore'):
+            # Scaled forward pass
+            alpha = np.empty_like(B)
+            scales = np.ones(mask.shape)
+            a = pi[None, :] * B[:, 0]
+            for t in range(T_max):
+                if t > 0:
+                    a = (alpha[:, t-1] @ A) * B[:, t]
+                c = a.sum(axis=1)
+                c = np.where(mask[:, t], c, 1.0)
+                scales[:, t] = c
+                alpha[:, t] = a / c[:, None]
+
+            # Scaled backward pass; beta stays 1 from each sequence's last step
+            beta = np.ones_like(B)
+            for t in range(T_max - 2, -1, -1):
+                b_next = (B[:, t+1] * beta[:, t+1]) @ A.T / scales[:, t+1, None]
+                beta[:, t] = np.where((t < block_len - 1)[:, None], b_next, 1.0)
+
+            gamma = alpha * beta * mask[:, :, None]
+
+            # Drop sequences whose scaling broke down on extreme observations
+            valid = np.all((scales > 0) & np.isfinite(scales), axis=1)
+            valid &= np.all(np.isfinite(gamma), axis=(1, 2))
+            if not np.any(valid):
+                continue
+
+            gamma = gamma[valid]
+            pair_mask = mask[valid, 1:, None]
+            weighted_next = B[valid, 1:] * beta[valid, 1:] / scales[valid, 1:, None] * pair_mask
+            trans = A * (alpha[valid, :-1].reshape(-1, N).T @ weighted_next.reshape(-1, N))
+
+        # Flatten (sequence, time) so the reductions are plain matrix products
+        flat_gamma = gamma.reshape(-1, N)
+        flat_obs = obs[valid].reshape(-1, D)
+        flat_outer = (flat_obs[:, :, None] * flat_obs[:, None, :]).reshape(-1, D * D)
+
+        stats["start"] += gamma[:, 0].sum(axis=0)
+        stats["trans"] += trans
+        stats["occupancy"] += flat_gamma.sum(axis=0)
+        stats["obs_sum"] += flat_gamma.T @ flat_obs
+        stats["obs_outer"] += (flat_gamma.T @ flat_outer).reshape(N, D, D)
+        stats["log_likelihood"] += float(
+            np.sum(np.log(scales[valid])) + np.sum(row_max[valid, :, 0] * mask[valid])
+        )
+        stats["n_sequences"] += int(valid.sum())
+
+    return stats
+
+
+def _worker_statistics(params, trends):
+    return sufficient_statistics(
+        *params, _worker_observations, _worker_offsets, trends=trends, columns=_worker_columns
+    )
+
+
+def _merge_statistics(parts):
+    total = parts[0]
+    for part in parts[1:]:
+        for key in total:
+            total[key] = total[key] + part[key]
+    return total
+
+
+def baum_welch(model, sequences, n_iter=50, tol=1e-3, n_jobs=None, min_covar=1e-4, verbose=False):
+    """
+    Fit model parameters in place with EM over a list of observation sequences.
+
+    Zero entries in the transition matrix and initial probabilities stay zero,
+    so left-to-right lifecycle structure is preserved. Observations must be
+    complete: sequences containing NaN raise ValueError.
+
+    Args:
+        model: HiddenMarkovModel providing the starting parameters
+        sequences: List of (T_b, D) observation arrays, one per trend
+        n_iter: Maximum EM iterations
+        tol: Stop when total log-likelihood improves by less than this
+        n_jobs: Worker processes for the E-step (default: all cores, 1 = inline)
+        min_covar: Floor added to covariance diagonals in the M-step
+        verbose: Print log-likelihood per iteration
+
+    Returns:
+        List of total log-likelihoods, one per iteration
+    """
+    sequences = [np.asarray(s, dtype=float) for s in sequences if len(s) > 0]
+    if not sequences:
+        raise ValueError("No non-empty sequences to train on")
+
+    observations = np.concatenate(sequences)
+    offsets = np.concatenate([[0], np.cumsum([len(s) for s in sequences])])
+    return baum_welch_indexed(
+        model, observations, offsets, n_iter=n_iter, tol=tol, n_jobs=n_jobs,
+        min_covar=min_covar, verbose=verbose
+    )
+
+
+def baum_welch_indexed(model, observations, offsets, trends=None, columns=None, n_iter=50, tol=1e-3,
+                       n_jobs=None, min_covar=1e-4, verbose=False):
+    """
+    baum_welch over sequences addressed in one concatenated array, without
+    copying them out: e.g. a fold's trends and a feature subset of a shared
+    observation matrix.
+
+    Args:
+        observations: (sum(T_b), F) observations of all trends back to back
+        offsets: (B + 1,) boundaries, trend b is observations[offsets[b]:offsets[b+1]]
+        trends: Indices of the trends to train on (default: all)
+        columns: Indices of the model's features among the F columns (default: all)
+        (other arguments as in baum_welch)
+
+    Returns:
+        List of total log-likelihoods, one per iteration
+    """
+    offsets = np.asarray(offsets, dtype=int)
+    trends = np.arange(len(offsets) - 1) if trends is None else np.asarray(trends, dtype=int)
+    trends = trends[offsets[trends + 1] > offsets[trends]]
+    n_seq = len(trends)
+    if n_seq == 0:
+        raise ValueError("No non-empty sequences to train on")
+
+    # The E-step scores complete rows only; a gap would silently void its sequence
+    gappy = 0
+    for b in trends:
+        rows = observations[offsets[b]:offsets[b + 1]]
+        gappy += bool(np.isnan(rows if columns is None else rows[:, columns]).any())
+    if gappy:
+        raise ValueError(
+            f"{gappy} of {n_seq} sequences contain missing values (NaN); "
+            "training requires complete observations, so impute or drop them first"
+        )
+
+    n_jobs = n_jobs or os.cpu_count() or 1
+    n_jobs = max(1, min(n_jobs, n_seq))
+    chunks = [part for part in np.array_split(trends, n_jobs) if len(part)]
+
+    pool = None
+    if n_jobs > 1:
+        pool = ProcessPoolExecutor(
+            max_workers=n_jobs,
+            initializer=_init_worker,
+            initargs=(observations, offsets, columns)
+        )
+
+    history = []
+    try:
+        for iteration in range(n_iter):
+            params = (
+                np.asarray(model.pi, dtype=float),
+                np.asarray(model.A, dtype=float),
+                np.asarray(model.emission_means, dtype=float),
+                model.inv_covs,
+                model.log_dets
+            )
+
+            # E-step
+            if pool is not None:
+                parts = list(pool.map(_worker_statistics, [params] * len(chunks), chunks))
+            else:
+                parts = [sufficient_statistics(*params, observations, offsets, trends=trends, columns=columns)]
+            stats = _merge_statistics(parts)
+
+            if stats["n_sequences"] == 0:
+                raise ValueError("All sequences have zero likelihood under the current model")
+
+            # M-step
+            _maximize(model, stats, min_covar)
+
+            history.append(stats["log_likelihood"])
+            if verbose:
+                print(f"   Iteration {iteration + 1}: log-likelihood = {stats['log_likelihood']:.2f}")
+
+            if len(history) > 1 and abs(history[-1] - history[-2]) < tol:
+                break
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    return history
+
+
+def _maximize(model, stats, min_covar):
+    """M-step: re-estimate parameters from summed statistics."""
+    N = model.n_states
+    occupancy = stats["occupancy"]
+
+    model.pi = stats["start"] / stats["start"].sum()
+
+    trans = stats["trans"]
+    row_sums = trans.sum(axis=1, keepdims=True)
+    model.A = np.where(row_sums > 0, trans / np.where(row_sums > 0, row_sums, 1.0), model.A)
+
+    means = np.array(model.emission_means, dtype=float)
+    # Full (N, D, D) matrices whatever the covariance type; the model's
+    # emission_covs setter keeps only the diagonal for 'diag' models
+    covs = model.cov_cholesky @ np.swapaxes(model.cov_cholesky, 1, 2)
+    dim = means.shape[1]
+
+    for i in range(N):
+        # Keep the previous parameters for states the data never visits
+        if occupancy[i] < 1e-8:
+            continue
+        means[i] = stats["obs_sum"][i] / occupancy[i]
+        covs[i] = stats["obs_outer"][i] / occupancy[i] - np.outer(means[i], means[i])
+        covs[i] = (covs[i] + covs[i].T) / 2 + np.eye(dim) * min_covar
+
+    model.emission_means = means
+    model.emission_covs = covs
+
+
+def nan_moments(parts):
+    """
+    Per-column mean and variance over the rows of several arrays, ignoring
+    NaNs, accumulated one array at a time instead of over a concatenation.
+
+    Returns:
+        Tuple of (mean, variance, number of rows)
+    """
+    count = total = total_sq = 0.0
+    n_rows = 0
+    for part in parts:
+        part = np.asarray(part, dtype=float)
+        observed = ~np.isnan(part)
+        values = np.where(observed, part, 0.0)
+        count = count + observed.sum(axis=0)
+        total = total + values.sum(axis=0)
+        total_sq = total_sq + (values ** 2).sum(axis=0)
+        n_rows += len(part)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+        variance = np.maximum(total_sq / count - mean ** 2, 0.0)
+    return mean, variance, n_rows
+
+
+def expand_features(model, sequences, features, covariance_type='diag'):
+    """
+    Starting point for training a model over a different feature set.
+
+    Features the model already has keep their state means and variances;
+    new ones start at the pooled mean/variance of the data in every state,
+    so EM separates them by state from the existing dimensions.
+
+    Args:
+        model: Base HiddenMarkovModel (e.g. the default 5-state model)
+        sequences: List of (T_b, len(features)) arrays in `features` order
+        features: Feature names of the new model
+        covariance_type: 'full' or 'diag'
+
+    Returns:
+        New HiddenMarkovModel with the same states and transitions
+    """
+    pooled_mean, pooled_var, _ = nan_moments(sequences)
+    N, D = model.n_states, len(features)
+
+    means = np.tile(pooled_mean, (N, 1))
+    variances = np.tile(pooled_var + 1e-4, (N, 1))
+
+    base_means = np.asarray(model.emission_means, dtype=float)
+    base_covs = np.asarray(model.emission_covs, dtype=float)
+    base_vars = base_covs if base_covs.ndim == 2 else np.diagonal(base_covs, axis1=1, axis2=2)
+    for d, name in enumerate(features):
+        if name in model.features:
+            k = model.features.index(name)
+            means[:, d] = base_means[:, k]
+            variances[:, d] = base_vars[:, k]
+
+    covs = variances if covariance_type == 'diag' else variances[:, :, None] * np.eye(D)
+    return HiddenMarkovModel(
+        states=model.states,
+        emission_means=means,
+        emission_covs=covs,
+        transition_matrix=np.array(model.A, dtype=float),
+        initial_probs=np.array(model.pi, dtype=float),
+        allowed_transitions=model.allowed_transitions,
+        features=features,
+        covariance_type=covariance_type
+    )
@@ -4,10 +4,21 @@ Data Loader Utilities for TrendGuard
 Handles loading and preprocessing trend data for HMM analysis.
 """
 
+import os
+import json
+import uuid
+import hashlib
 import pandas as pd
 import numpy as np
 from typing import Tuple, List, Optional
 
+# Parquet engine for the columnar dataset cache
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
 # Core metrics required for HMM
 CORE_METRICS = ['velocity', 'fatigue', 'retention']
 
@@ -21,10 +32,289 @@ EXTENDED_METRICS = [
     'content_originality'
 ]
 
+# Columns added by compute_derived_metrics
+DERIVED_METRICS = ['velocity_momentum', 'fatigue_rate', 'health_score', 'risk_score']
+
+# Low-cardinality text columns stored as categories in the columnar cache
+CATEGORY_COLUMNS = ['trend_name', 'archetype', 'platform']
+
+CACHE_FORMAT = 2
+CACHE_DIRNAME = ".cache"
+CACHE_ROW_GROUP_SIZE = 64_000
+
+STORE_FORMAT = 1
+STORE_MANIFEST = "store.json"
+
+
+def resolve_features(df: pd.DataFrame, features: Optional[List[str]] = None) -> List[str]:
+    """
+    Validate the HMM feature columns against a DataFrame.
+    
+    Args:
+        df: Loaded data
+        features: Any subset of CORE_METRICS + EXTENDED_METRICS (default: core only)
+        
+    Returns:
+        List of feature column names
+    """
+    features = list(features) if features else list(CORE_METRICS)
+    
+    unknown = [f for f in features if f not in CORE_METRICS + EXTENDED_METRICS]
+    if unknown:
+        raise ValueError(f"Unknown features {unknown}; choose from {CORE_METRICS + EXTENDED_METRICS}")
+    
+    missing = [f for f in features if f not in df.columns]
+    if missing:
+        raise ValueError(f"CSV must contain feature columns: {missing}")
+    
+    return features
+
+
+def read_source(filepath: str) -> pd.DataFrame:
+    """Read a CSV or Excel dataset."""
+    if filepath.endswith(('.xlsx', '.xls')):
+        return pd.read_excel(filepath)
+    return pd.read_csv(filepath)
+
+
+def cache_path(filepath: str, cache_dir: Optional[str] = None) -> str:
+    """Location of the columnar cache for a source file (data/.cache/ by default)."""
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(filepath)), CACHE_DIRNAME)
+    return os.path.join(cache_dir, os.path.basename(filepath) + ".parquet")
+
+
+def _file_sha256(filepath: str) -> str:
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _mkstemp(directory: str, suffix: str = ".tmp"):
+    """
+    Like tempfile.mkstemp, but created with the usual 0666 & ~umask mode
+    instead of 0600, so the renamed file is readable by other users (e.g. a
+    backend running under a different account).
+    """
+    while True:
+        tmp = os.path.join(directory, f"tmp{uuid.uuid4().hex}{suffix}")
+        try:
+            return os.open(tmp, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o666), tmp
+        except FileExistsError:
+            continue
+
+
+def _atomic_write(path: str, write) -> None:
+    """Write via a temp file + rename so concurrent readers never see partial files."""
+    fd, tmp = _mkstemp(os.path.dirname(path))
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def to_columnar(df: pd.DataFrame) -> pd.DataFrame:
+    """Category dtype for CATEGORY_COLUMNS and float32 for float metrics."""
+    df = df.copy()
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    for col in df.select_dtypes(include='floating').columns:
+        df[col] = df[col].astype(np.float32)
+    return df
+
+
+def _cache_is_valid(filepath: str, meta_path: str) -> bool:
+    """
+    Cheap check first (size + mtime); if only the mtime moved, fall back to
+    the content hash so touching a file does not force a rebuild.
+    """
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path, encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format") != CACHE_FORMAT:
+        return False
+
+    stat = os.stat(filepath)
+    if meta["size"] != stat.st_size:
+        return False
+    if meta["mtime_ns"] == stat.st_mtime_ns:
+        return True
+    if meta["sha256"] != _file_sha256(filepath):
+        return False
+
+    meta["mtime_ns"] = stat.st_mtime_ns
+    _atomic_write(meta_path, lambda tmp: _write_json(tmp, meta))
+    return True
+
+
+def _write_json(path: str, obj) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=2)
+
+
+def build_columnar_cache(filepath: str, cache_dir: Optional[str] = None) -> str:
+    """
+    Convert a CSV/XLSX source into a Parquet cache next to it.
+    
+    Rows are sorted by (trend_name, date) and written in row groups, so
+    Parquet min/max statistics let filtered reads skip unrelated trends.
+    
+    Returns:
+        Path of the Parquet file
+    """
+    path = cache_path(filepath, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    stat = os.stat(filepath)
+    df = to_columnar(read_source(filepath))
+    sort_cols = [c for c in ('trend_name', 'date') if c in df.columns]
+    if sort_cols:
+        df = df.sort_values(sort_cols, kind='stable').reset_index(drop=True)
+    _atomic_write(path, lambda tmp: df.to_parquet(tmp, index=False, row_group_size=CACHE_ROW_GROUP_SIZE))
+
+    meta = {
+        "format": CACHE_FORMAT,
+        "source": os.path.abspath(filepath),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": _file_sha256(filepath),
+        "rows": len(df),
+        "columns": list(df.columns)
+    }
+    _atomic_write(path + ".json", lambda tmp: _write_json(tmp, meta))
+    return path
+
+
+def load_dataset(
+    filepath: str,
+    columns: Optional[List[str]] = None,
+    cache_dir: Optional[str] = None,
+    filters: Optional[List[tuple]] = None
+) -> pd.DataFrame:
+    """
+    Load a CSV/XLSX dataset through its columnar cache, rebuilding the cache
+    when the source changes.
+    
+    Args:
+        filepath: Source CSV or Excel file
+        columns: Columns to read (missing ones are skipped); default all
+        cache_dir: Cache directory (default: .cache/ next to the source)
+        filters: Row predicates as (column, op, value) tuples, all of which
+            must hold; op is one of ==, !=, <, <=, >, >=, in. Pushed down to
+            the Parquet reader so non-matching row groups are skipped.
+        
+    Returns:
+        DataFrame with category text columns and float32 metrics
+    """
+    if not PARQUET_AVAILABLE:
+        df = apply_filters(to_columnar(read_source(filepath)), filters)
+        return df[[c for c in columns if c in df.columns]] if columns else df
+
+    meta = ensure_columnar_cache(filepath, cache_dir)
+    if columns:
+        columns = [c for c in columns if c in meta["columns"]]
+    if filters:
+        unknown = [f[0] for f in filters if f[0] not in meta["columns"]]
+        if unknown:
+            raise ValueError(f"Cannot filter on missing columns: {unknown}")
+    return pd.read_parquet(cache_path(filepath, cache_dir), columns=columns, filters=filters or None)
+
+
+def load_store(
+    store_path: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    trend_names: Optional[List[str]] = None,
+    columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Load rows from the partitioned trend store, opening only the partitions
+    that match the date range and trends.
+    
+    Args:
+        store_path: Store directory (default: data/trend_store)
+        start_date, end_date: Inclusive ISO dates (default: unbounded)
+        trend_names: Only these trends (default: all)
+        columns: Columns to read (default: all)
+        
+    Returns:
+        DataFrame sorted by (trend_name, date)
+    """
+    # Imported here: trend_store builds on this module
+    from .trend_store import TrendStore, DEFAULT_STORE_DIR
+    store = TrendStore(store_path or DEFAULT_STORE_DIR)
+    return store.read(start_date=start_date, end_date=end_date, trend_names=trend_names, columns=columns)
+
+
+def ingest_daily(filepath: str, store_path: Optional[str] = None) -> List[dict]:
+    """
+    Append a file of daily rows to the trend store. Rows whose (date,
+    trend_name) the store already holds are skipped, so re-running an ingest
+    does not duplicate data and a day may arrive split across several files.
+    
+    Returns:
+        Manifest entries of the partitions written
+    """
+    from .trend_store import TrendStore, DEFAULT_STORE_DIR, _normalize_dates
+    store = TrendStore(store_path or DEFAULT_STORE_DIR)
+    df = read_source(filepath)
+    missing = [c for c in ("date", "trend_name") if c not in df.columns]
+    if missing:
+        raise ValueError(f"Rows must contain columns: {missing}")
+    if len(df) == 0:
+        return []
+    
+    # Only partitions of these days and trends' buckets are opened
+    keys = pd.DataFrame({"date": _normalize_dates(df["date"]), "trend_name": df["trend_name"].astype(str)})
+    stored = store.read(
+        start_date=keys["date"].min(), end_date=keys["date"].max(),
+        trend_names=keys["trend_name"].unique().tolist(), columns=[]
+    )
+    stored = set(zip(stored["date"].astype(str), stored["trend_name"].astype(str)))
+    new = ~pd.Series(list(zip(keys["date"], keys["trend_name"]))).isin(stored).to_numpy()
+    return store.append(df[new])
+
+
+def apply_filters(df: pd.DataFrame, filters: Optional[List[tuple]] = None) -> pd.DataFrame:
+    """In-memory equivalent of the (column, op, value) filters of load_dataset."""
+    if not filters:
+        return df
+    ops = {
+        '==': lambda c, v: c == v, '!=': lambda c, v: c != v,
+        '<': lambda c, v: c < v, '<=': lambda c, v: c <= v,
+        '>': lambda c, v: c > v, '>=': lambda c, v: c >= v,
+        'in': lambda c, v: c.isin(v)
+    }
+    mask = np.ones(len(df), dtype=bool)
+    for column, op, value in filters:
+        mask &= ops[op](df[column], value).to_numpy(dtype=bool)
+    return df[mask]
+
+
+def ensure_columnar_cache(filepath: str, cache_dir: Optional[str] = None) -> dict:
+    """
+    Build or refresh the columnar cache of a source file.
+    
+    Returns:
+        Cache metadata (source size/mtime/sha256, rows, columns)
+    """
+    path = cache_path(filepath, cache_dir)
+    if not os.path.exists(path) or not _cache_is_valid(filepath, path + ".json"):
+        build_columnar_cache(filepath, cache_dir)
+    with open(path + ".json", encoding="utf-8") as f:
+        return json.load(f)
+
 
 def load_and_prep_data(
     filepath: str,
-    trend_name: Optional[str] = None
+    trend_name: Optional[str] = None,
+    features: Optional[List[str]] = None
 ) -> Tuple[pd.DataFrame, np.ndarray]:
     """
     Loads CSV and returns raw DataFrame + observation matrix for HMM.
@@ -32,34 +322,270 @@ def load_and_prep_data(
     Args:
         filepath: Path to CSV file
         trend_name: Optional - filter to specific trend
+        features: Observation columns (default: CORE_METRICS)
         
     Returns:
         Tuple of (DataFrame, numpy array of observations)
     """
+    # Files without a trend_name column hold one trend; the filter does not apply
+    if trend_name and "trend_name" in pd.read_csv(filepath, nrows=0).columns:
+        # Stream the file so only the requested trend's rows are held in memory
+        for _, (df, observations) in iter_trends(filepath, trend_name=trend_name, features=features):
+            return df, observations
+        raise ValueError(f"No data found for trend: {trend_name}")
+    
     df = pd.read_csv(filepath)
     
-    # Validate core columns exist
-    if not all(col in df.columns for col in CORE_METRICS):
-        raise ValueError(f"CSV must contain core metrics: {CORE_METRICS}")
+    # Validate feature columns exist
+    features = resolve_features(df, features)
+    
+    # Convert to numpy matrix for HMM
+    observations = df[features].values
+    
+    return df, observations
+
+
+def iter_trends(
+    filepath: str,
+    trend_name: Optional[str] = None,
+    features: Optional[List[str]] = None,
+    chunksize: int = 100_000,
+    grouped: bool = False
+):
+    """
+    Stream a multi-trend CSV in chunks, yielding one trend at a time.
     
-    # Filter by trend if specified
-    if trend_name and 'trend_name' in df.columns:
-        df = df[df['trend_name'] == trend_name].copy()
-        if len(df) == 0:
+    With grouped=True (each trend's rows are contiguous, e.g. a file sorted by
+    trend_name) a trend is yielded as soon as the next one starts, so peak
+    memory is about one chunk plus one trend and callers can decode while the
+    rest of the file is still being read. Otherwise rows are collected per
+    trend and everything is yielded at the end of the file. With trend_name,
+    only that trend's rows are kept; grouped input stops reading once it ends.
+    
+    Args:
+        filepath: Path to CSV file
+        trend_name: Optional - only yield this trend
+        features: Observation columns (default: CORE_METRICS)
+        chunksize: Rows per read
+        grouped: Input rows are contiguous per trend
+        
+    Yields:
+        (trend_name, (DataFrame, observations)) pairs
+    """
+    pending = {}
+    done = set()
+    
+    def emit(name):
+        df = pd.concat(pending.pop(name), ignore_index=True)
+        done.add(name)
+        return name, (df, df[features].values)
+    
+    for i, chunk in enumerate(pd.read_csv(filepath, chunksize=chunksize)):
+        if i == 0:
+            features = resolve_features(chunk, features)
+        if 'trend_name' not in chunk.columns:
+            chunk['trend_name'] = "default"
+        
+        if trend_name is not None:
+            match = (chunk['trend_name'] == trend_name).to_numpy()
+            started = trend_name in pending or match.any()
+            if match.any():
+                pending.setdefault(trend_name, []).append(chunk[match])
+            # Grouped input: a different trend after ours means it is complete
+            if grouped and started and not match[-1]:
+                break
+            continue
+        
+        names = chunk['trend_name'].to_numpy()
+        starts = np.concatenate([[0], np.nonzero(names[1:] != names[:-1])[0] + 1])
+        stops = np.append(starts[1:], len(names))
+        
+        for start, stop in zip(starts, stops):
+            name = names[start]
+            if grouped and name in done:
+                raise ValueError(f"Input is not grouped by trend_name: {name} appears twice")
+            if grouped and pending and name not in pending:
+                # A new trend started, so the previous one is complete
+                yield emit(next(iter(pending)))
+            pending.setdefault(name, []).append(chunk.iloc[start:stop])
+    
+    for name in list(pending):
+        yield emit(name)
+
+
+class _OffsetIndex:
+    """Trend lookup over a (rows, D) observation array split by offsets."""
+    
+    names: List[str]
+    offsets: np.ndarray
+    values: np.ndarray
+    
+    def _build_position(self):
+        self._position = {name: i for i, name in enumerate(self.names)}
+    
+    def __len__(self) -> int:
+        return len(self.names)
+    
+    def __contains__(self, trend_name) -> bool:
+        return trend_name in self._position
+    
+    def __iter__(self):
+        return iter(self.names)
+    
+    def bounds(self, trend_name: str) -> Tuple[int, int]:
+        """Start/stop row offsets of a trend."""
+        if trend_name not in self._position:
             raise ValueError(f"No data found for trend: {trend_name}")
+        i = self._position[trend_name]
+        return int(self.offsets[i]), int(self.offsets[i + 1])
     
-    # Convert to numpy matrix for HMM (core metrics only)
-    observations = df[CORE_METRICS].values
+    def observations(self, trend_name: str) -> np.ndarray:
+        """(T, D) view into the shared feature array."""
+        start, stop = self.bounds(trend_name)
+        return self.values[start:stop]
     
-    return df, observations
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
 
 
-def load_multi_trend_data(filepath: str) -> dict:
+class TrendIndex(_OffsetIndex):
+    """
+    Multi-trend dataset sorted by (trend_name, date) with per-trend offsets.
+    
+    The HMM features of all trends live in one contiguous float array, so a
+    trend's observations are a zero-copy slice and the whole dataset can be
+    handed to batch decoders as (values, offsets) directly.
+    """
+    
+    def __init__(self, df: pd.DataFrame, features: Optional[List[str]] = None):
+        self.features = resolve_features(df, features)
+        
+        if 'trend_name' not in df.columns:
+            df = df.assign(trend_name="default")
+        sort_cols = ['trend_name', 'date'] if 'date' in df.columns else ['trend_name']
+        self.df = df.sort_values(sort_cols, kind='stable').reset_index(drop=True)
+        
+        # Trend boundaries are where the sorted name changes
+        names = self.df['trend_name'].to_numpy()
+        if len(names):
+            starts = np.concatenate([[0], np.nonzero(names[1:] != names[:-1])[0] + 1])
+        else:
+            starts = np.zeros(0, dtype=int)
+        self.offsets = np.append(starts, len(names)).astype(np.int64)
+        self.names = [names[i] for i in starts]
+        self._build_position()
+        
+        self.values = np.ascontiguousarray(self.df[self.features].to_numpy(dtype=np.float64))
+    
+    @classmethod
+    def from_csv(cls, filepath: str, features: Optional[List[str]] = None) -> "TrendIndex":
+        return cls(pd.read_csv(filepath), features)
+    
+    @classmethod
+    def from_store(
+        cls,
+        features: Optional[List[str]] = None,
+        store_path: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        trend_names: Optional[List[str]] = None
+    ) -> "TrendIndex":
+        """Index over a date range / set of trends read from the trend store."""
+        return cls(load_store(store_path, start_date, end_date, trend_names), features)
+    
+    def frame(self, trend_name: str) -> pd.DataFrame:
+        """Rows of one trend (a positional slice, not a boolean-mask copy)."""
+        start, stop = self.bounds(trend_name)
+        return self.df.iloc[start:stop]
+    
+    def items(self):
+        """Yield (trend_name, (DataFrame slice, observation view)) pairs."""
+        for name in self.names:
+            yield name, (self.frame(name), self.observations(name))
+
+
+class ObservationStore(_OffsetIndex):
+    """
+    Read-only, memory-mapped observations of a whole trend corpus.
+    
+    On disk a store directory holds a raw float32 (rows, D) metric matrix, an
+    int64 offsets array and store.json with the feature and trend names.
+    Workers that open the same store share it through the OS page cache, and
+    reading one trend only touches that trend's pages.
+    """
+    
+    def __init__(self, path: str):
+        with open(os.path.join(path, STORE_MANIFEST), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != STORE_FORMAT:
+            raise ValueError(f"Unsupported observation store format: {meta.get('format')}")
+        
+        self.path = path
+        self.features = meta["features"]
+        self.names = meta["trend_names"]
+        self.offsets = np.fromfile(os.path.join(path, meta["offsets"]), dtype=np.int64)
+        self._build_position()
+        
+        shape = (int(self.offsets[-1]), len(self.features))
+        if shape[0] == 0:
+            self.values = np.zeros(shape, dtype=np.float32)
+        else:
+            self.values = np.memmap(os.path.join(path, meta["metrics"]), dtype=np.float32, mode='r', shape=shape)
+
+
+def write_observation_store(data, path: str, features: Optional[List[str]] = None) -> str:
+    """
+    Write a memory-mappable observation store.
+    
+    Data files are named by content hash and store.json is replaced last,
+    so readers never see a half-written store and open memmaps stay valid.
+    
+    Args:
+        data: TrendIndex, or DataFrame with trend_name/date and metric columns
+        path: Store directory
+        features: Metric columns (default: CORE_METRICS; ignored for a TrendIndex)
+        
+    Returns:
+        The store path
+    """
+    index = data if isinstance(data, TrendIndex) else TrendIndex(data, features)
+    os.makedirs(path, exist_ok=True)
+    
+    metrics = np.ascontiguousarray(index.values, dtype=np.float32)
+    offsets = np.ascontiguousarray(index.offsets, dtype=np.int64)
+    digest = hashlib.sha256(metrics.tobytes() + offsets.tobytes()).hexdigest()[:16]
+    
+    files = {"metrics": f"metrics-{digest}.f32", "offsets": f"offsets-{digest}.i64"}
+    _atomic_write(os.path.join(path, files["metrics"]), metrics.tofile)
+    _atomic_write(os.path.join(path, files["offsets"]), offsets.tofile)
+    
+    meta = {
+        "format": STORE_FORMAT,
+        "features": list(index.features),
+        "trend_names": [str(name) for name in index.names],
+        **files
+    }
+    _atomic_write(os.path.join(path, STORE_MANIFEST), lambda tmp: _write_json(tmp, meta))
+    
+    # Superseded data files; processes that still map them keep their pages
+    for name in os.listdir(path):
+        if name.endswith((".f32", ".i64")) and name not in files.values():
+            os.remove(os.path.join(path, name))
+    return path
+
+
+def observation_store_path(filepath: str, cache_dir: Optional[str] = None) -> str:
+    """Default store location for a source file, next to its columnar cache."""
+    return cache_path(filepath, cache_dir)[:-len(".parquet")] + ".obs"
+
+
+def load_multi_trend_data(filepath: str, features: Optional[List[str]] = None) -> dict:
     """
     Load dataset with multiple trends and organize by trend name.
     
     Args:
         filepath: Path to CSV file
+        features: Observation columns (default: CORE_METRICS)
         
     Returns:
         Dict mapping trend_name -> (DataFrame, observations)
@@ -68,16 +594,11 @@ def load_multi_trend_data(filepath: str) -> dict:
     
     if 'trend_name' not in df.columns:
         # Single trend - return as single entry
-        observations = df[CORE_METRICS].values
+        features = resolve_features(df, features)
+        observations = df[features].values
         return {"default": (df, observations)}
     
-    result = {}
-    for trend_name in df['trend_name'].unique():
-        trend_df = df[df['trend_name'] == trend_name].copy()
-        observations = trend_df[CORE_METRICS].values
-        result[trend_name] = (trend_df, observations)
-    
-    return result
+    return dict(TrendIndex(df, features).items())
 
 
 def get_available_metrics(df: pd.DataFrame) -> dict:
@@ -94,36 +615,82 @@ def get_available_metrics(df: pd.DataFrame) -> dict:
     return available
 
 
-def compute_derived_metrics(df: pd.DataFrame) -> pd.DataFrame:
+def compute_derived_metrics(
+    df: pd.DataFrame,
+    previous: Optional[pd.DataFrame] = None,
+    inplace: bool = False
+) -> pd.DataFrame:
     """
     Compute additional derived metrics from existing data.
     
+    Day-over-day changes are taken within each trend (rows in date order), so
+    the first day of a trend never differences against another trend. Rows of
+    a trend should be contiguous (e.g. a TrendIndex frame); interleaved input
+    is regrouped with one stable sort and scattered back.
+    
     Args:
         df: Input DataFrame with core metrics
+        previous: Earlier rows of the same trends, for incremental updates when
+            df holds newly appended days; each trend's first new day then
+            differences against its last previous day instead of being 0
+        inplace: Add the columns to df itself instead of a shallow copy
         
     Returns:
-        DataFrame with additional computed columns
+        DataFrame with additional float32 columns velocity_momentum,
+        fatigue_rate, health_score and risk_score
     """
-    df = df.copy()
+    if not inplace:
+        df = df.copy(deep=False)
+    n = len(df)
     
-    # Velocity change rate (momentum)
-    df['velocity_momentum'] = df['velocity'].diff().fillna(0)
+    velocity = df['velocity'].to_numpy(dtype=np.float32)
+    fatigue = df['fatigue'].to_numpy(dtype=np.float32)
+    retention = df['retention'].to_numpy(dtype=np.float32)
     
-    # Fatigue acceleration
-    df['fatigue_rate'] = df['fatigue'].diff().fillna(0)
+    names = df['trend_name'].to_numpy() if 'trend_name' in df.columns else np.zeros(n, dtype=int)
+    codes, uniques = pd.factorize(names)
+    
+    # Contiguous groups (factorize numbers trends by first appearance) need no reordering
+    order = None
+    if n and np.any(np.diff(codes) < 0):
+        order = np.argsort(codes, kind='stable')
+        codes, velocity, fatigue, retention = codes[order], velocity[order], fatigue[order], retention[order]
+    
+    first = np.ones(n, dtype=bool)
+    first[1:] = codes[1:] != codes[:-1]
+    
+    # Previous day's values, a trend's first day being its own predecessor
+    prev = np.empty((2, n), dtype=np.float32)
+    prev[0, 1:], prev[1, 1:] = velocity[:-1], fatigue[:-1]
+    prev[0, first], prev[1, first] = velocity[first], fatigue[first]
+    
+    if previous is not None and len(previous) and 'trend_name' in previous.columns:
+        last = previous.groupby('trend_name', sort=False, observed=True)[['velocity', 'fatigue']].last()
+        first_rows = np.nonzero(first)[0]
+        positions = last.index.get_indexer(uniques[codes[first_rows]])
+        known = positions >= 0
+        prev[:, first_rows[known]] = last.to_numpy(dtype=np.float32)[positions[known]].T
+    
+    # Preallocated float32 output, one column per derived metric
+    out = np.empty((n, 4), dtype=np.float32)
+    
+    # Velocity change rate (momentum) and fatigue acceleration
+    np.subtract(velocity, prev[0], out=out[:, 0])
+    np.subtract(fatigue, prev[1], out=out[:, 1])
+    np.nan_to_num(out[:, :2], copy=False, nan=0.0)
     
     # Combined health score (higher = healthier)
-    df['health_score'] = (
-        df['velocity'] * 0.4 + 
-        (1 - df['fatigue']) * 0.3 + 
-        df['retention'] * 0.3
-    )
+    out[:, 2] = velocity * 0.4 + (1 - fatigue) * 0.3 + retention * 0.3
     
     # Risk score (higher = more at risk)
-    df['risk_score'] = (
-        (1 - df['velocity']) * 0.4 +
-        df['fatigue'] * 0.4 +
-        (1 - df['retention']) * 0.2
-    )
+    out[:, 3] = (1 - velocity) * 0.4 + fatigue * 0.4 + (1 - retention) * 0.2
+    
+    if order is not None:
+        unsorted = np.empty_like(out)
+        unsorted[order] = out
+        out = unsorted
+    
+    for k, col in enumerate(DERIVED_METRICS):
+        df[col] = out[:, k]
     
-    return df
\ No newline at end of file
+    return df
@@ -0,0 +1,289 @@
+"""
+Trend Query Layer
+=================
+Embedded SQLite database over the trend dataset and its decoded HMM states,
+for listing, filtering and aggregation without scanning the data in pandas.
+
+The database is built next to the columnar cache (data/.cache/) from the
+same source and rebuilt when the source content hash changes. Per-trend
+summaries are materialized at build time, so listing is a small table read.
+
+Tables:
+    metrics(trend_name, date, platform, archetype, <metric columns>)
+    states(trend_name, date, state, model_hash)
+    trends(trend_name, start_date, end_date, data_points, archetype, platform)
+"""
+
+import os
+import sqlite3
+import pandas as pd
+from contextlib import closing
+from typing import List, Optional
+
+from .data_loader import (
+    PARQUET_AVAILABLE,
+    cache_path,
+    ensure_columnar_cache,
+    load_dataset,
+    read_source,
+    _file_sha256,
+    _mkstemp
+)
+
+DB_FORMAT = 1
+
+_INDEXES = [
+    "CREATE INDEX idx_metrics_trend_date ON metrics (trend_name, date)",
+    "CREATE INDEX idx_metrics_platform ON metrics (platform, date)",
+    "CREATE INDEX idx_trends_platform ON trends (platform)",
+    "CREATE INDEX idx_trends_archetype ON trends (archetype)",
+]
+_STATE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_states_trend_date ON states (trend_name, date)",
+    "CREATE INDEX IF NOT EXISTS idx_states_state_date ON states (state, date)",
+]
+
+
+def db_path(filepath: str, cache_dir: Optional[str] = None) -> str:
+    """Location of the query database for a source file."""
+    return cache_path(filepath, cache_dir)[:-len(".parquet")] + ".sqlite"
+
+
+def _source_sha256(filepath: str, cache_dir: Optional[str] = None) -> str:
+    if PARQUET_AVAILABLE:
+        return ensure_columnar_cache(filepath, cache_dir)["sha256"]
+    return _file_sha256(filepath)
+
+
+class TrendDatabase:
+    """
+    SQLite query layer over one trend dataset (CSV/XLSX).
+
+    Connections are opened per call, so one instance can be shared across
+    request threads.
+    """
+    def __init__(self, filepath: str, cache_dir: Optional[str] = None):
+        self.source = filepath
+        self.cache_dir = cache_dir
+        self.path = db_path(filepath, cache_dir)
+        self.refresh()
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.path))
+
+    def _meta(self, key):
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with self._connect() as con:
+                row = con.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        except sqlite3.DatabaseError:
+            return None
+        return row[0] if row else None
+
+    def refresh(self) -> bool:
+        """
+        Rebuild the database if the source changed since it was built.
+
+        Returns:
+            True if it was rebuilt (decoded states are then empty)
+        """
+        digest = _source_sha256(self.source, self.cache_dir)
+        if self._meta("source_sha256") == digest and self._meta("format") == str(DB_FORMAT):
+            return False
+        self._build(digest)
+        return True
+
+    def _build(self, digest):
+        """Load the source into a fresh database file and swap it in atomically."""
+        df = load_dataset(self.source, cache_dir=self.cache_dir) if PARQUET_AVAILABLE else read_source(self.source)
+        for col in df.select_dtypes(include="category").columns:
+            df[col] = df[col].astype(str)
+        for col in ("trend_name", "platform", "archetype"):
+            if col not in df.columns:
+                df[col] = "default" if col == "trend_name" else None
+        df["date"] = df["date"].astype(str)
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd, tmp = _mkstemp(os.path.dirname(self.path))
+        os.close(fd)
+        try:
+            with closing(sqlite3.connect(tmp)) as con:
+                df.to_sql("metrics", con, index=False, chunksize=100_000)
+                con.execute("""
+                    CREATE TABLE trends AS
+                    SELECT trend_name,
+                           MIN(date) AS start_date,
+                           MAX(date) AS end_date,
+                           COUNT(*) AS data_points,
+                           MIN(archetype) AS archetype,
+                           MIN(platform) AS platform
+                    FROM metrics GROUP BY trend_name ORDER BY trend_name
+                """)
+                con.execute("CREATE UNIQUE INDEX idx_trends_name ON trends (trend_name)")
+                for sql in _INDEXES:
+                    con.execute(sql)
+                con.execute("""
+                    CREATE TABLE states (
+                        trend_name TEXT, date TEXT, state TEXT, model_hash TEXT
+                    )
+                """)
+                for sql in _STATE_INDEXES:
+                    con.execute(sql)
+                con.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+                con.executemany("INSERT INTO meta VALUES (?, ?)", [
+                    ("format", str(DB_FORMAT)),
+                    ("source_sha256", digest),
+                    ("states_model_hash", "")
+                ])
+                con.commit()
+            os.replace(tmp, self.path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def query(self, sql: str, params=()) -> pd.DataFrame:
+        """Run an ad-hoc read query."""
+        with self._connect() as con:
+            return pd.read_sql_query(sql, con, params=params)
+
+    def list_trends(
+        self,
+        platform: Optional[str] = None,
+        archetype: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> List[dict]:
+        """
+        Per-trend summary rows (name, date span, data points, archetype,
+        platform), optionally only trends with data inside [start_date, end_date].
+        """
+        sql = "SELECT * FROM trends WHERE 1 = 1"
+        params = []
+        if platform:
+            sql += " AND platform = ?"
+            params.append(platform)
+        if archetype:
+            sql += " AND archetype = ?"
+            params.append(archetype)
+        if start_date:
+            sql += " AND end_date >= ?"
+            params.append(start_date)
+        if end_date:
+            sql += " AND start_date <= ?"
+            params.append(end_date)
+        return self.query(sql + " ORDER BY trend_name", params).to_dict(orient="records")
+
+    def trend_rows(
+        self,
+        trend_name: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+        platform: Optional[str] = None,
+        archetype: Optional[str] = None
+    ) -> pd.DataFrame:
+        """
+        One trend's rows in date order, optionally within [start_date, end_date]
+        and only if it matches platform/archetype. Served from the
+        (trend_name, date) index, so only the requested rows are read.
+        """
+        with self._connect() as con:
+            available = [r[1] for r in con.execute("PRAGMA table_info(metrics)")]
+        selected = [c for c in columns if c in available] if columns else available
+        select = ", ".join(f'"{c}"' for c in selected)
+
+        sql = f"SELECT {select} FROM metrics WHERE trend_name = ?"
+        params = [trend_name]
+        if start_date:
+            sql += " AND date >= ?"
+            params.append(start_date)
+        if end_date:
+            sql += " AND date <= ?"
+            params.append(end_date)
+        if platform:
+            sql += " AND platform = ?"
+            params.append(platform)
+        if archetype:
+            sql += " AND archetype = ?"
+            params.append(archetype)
+        return self.query(sql + " ORDER BY date", params)
+
+    def states_model_hash(self) -> Optional[str]:
+        """Hash of the model whose decoded states are stored ('' if none)."""
+        return self._meta("states_model_hash")
+
+    def write_states(self, states: pd.DataFrame, model_hash: str) -> None:
+        """
+        Replace the decoded states.
+
+        Args:
+            states: Rows with trend_name, date and state
+            model_hash: Hash of the model that produced them
+        """
+        rows = states[["trend_name", "date", "state"]].astype(str).assign(model_hash=model_hash)
+        with self._connect() as con:
+            con.execute("DELETE FROM states")
+            con.executemany(
+                "INSERT INTO states VALUES (?, ?, ?, ?)",
+                rows.itertuples(index=False, name=None)
+            )
+            con.execute("UPDATE meta SET value = ? WHERE key = 'states_model_hash'", (model_hash,))
+            con.commit()
+
+    def trends_in_state(
+        self,
+        state: str,
+        platform: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> List[dict]:
+        """
+        Trends that spent days in a state, e.g. TikTok trends in Saturation
+        during the last week.
+
+        Returns:
+            One dict per trend with platform, archetype, days_in_state,
+            first_date and last_date
+        """
+        sql = """
+            SELECT s.trend_name, t.platform, t.archetype,
+                   COUNT(*) AS days_in_state,
+                   MIN(s.date) AS first_date,
+                   MAX(s.date) AS last_date
+            FROM states s JOIN trends t ON t.trend_name = s.trend_name
+            WHERE s.state = ?
+        """
+        params = [state]
+        if platform:
+            sql += " AND t.platform = ?"
+            params.append(platform)
+        if start_date:
+            sql += " AND s.date >= ?"
+            params.append(start_date)
+        if end_date:
+            sql += " AND s.date <= ?"
+            params.append(end_date)
+        sql += " GROUP BY s.trend_name ORDER BY last_date DESC, s.trend_name"
+        return self.query(sql, params).to_dict(orient="records")
+
+    def state_counts(
+        self,
+        platform: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> dict:
+        """Number of trend-days per decoded state."""
+        sql = "SELECT s.state, COUNT(*) AS days FROM states s JOIN trends t ON t.trend_name = s.trend_name WHERE 1 = 1"
+        params = []
+        if platform:
+            sql += " AND t.platform = ?"
+            params.append(platform)
+        if start_date:
+            sql += " AND s.date >= ?"
+            params.append(start_date)
+        if end_date:
+            sql += " AND s.date <= ?"
+            params.append(end_date)
+        counts = self.query(sql + " GROUP BY s.state", params)
+        return dict(zip(counts["state"], counts["days"].astype(int)))
@@ -0,0 +1,197 @@
+"""
+Partitioned Trend Store
+=======================
+Append-only daily metric store under data/. Rows are partitioned by date and
+by a stable hash bucket of trend_name into small Parquet files, listed in a
+JSON manifest. Ingesting a day only adds new partitions, and reads open just
+the partitions whose date and bucket match the requested range and trends.
+
+Layout:
+    data/trend_store/manifest.json
+    data/trend_store/date=2026-01-09/bucket=03/part-<hash>.parquet
+"""
+
+import os
+import json
+import zlib
+import hashlib
+import pandas as pd
+import numpy as np
+from datetime import datetime
+from typing import List, Optional
+
+from .data_loader import (
+    PARQUET_AVAILABLE,
+    CATEGORY_COLUMNS,
+    to_columnar,
+    _atomic_write,
+    _write_json
+)
+
+STORE_FORMAT = 1
+MANIFEST = "manifest.json"
+DEFAULT_BUCKETS = 16
+DEFAULT_STORE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "data", "trend_store"
+)
+
+
+def trend_bucket(trend_name: str, n_buckets: int) -> int:
+    """Stable bucket of a trend name (same in every process, unlike hash())."""
+    return zlib.crc32(str(trend_name).encode("utf-8")) % n_buckets
+
+
+def _normalize_dates(dates: pd.Series) -> pd.Series:
+    """ISO YYYY-MM-DD strings, so partitions and range filters compare as text."""
+    return pd.to_datetime(dates).dt.strftime("%Y-%m-%d")
+
+
+class TrendStore:
+    """
+    Append-only, date x trend-bucket partitioned store of daily trend metrics.
+
+    A single writer is assumed; readers may run concurrently since partition
+    files are immutable and the manifest is replaced atomically.
+    """
+    def __init__(self, path: str = DEFAULT_STORE_DIR, n_buckets: int = DEFAULT_BUCKETS):
+        if not PARQUET_AVAILABLE:
+            raise ImportError("pyarrow is required for the trend store. Run: pip install pyarrow")
+
+        self.path = path
+        manifest_path = os.path.join(path, MANIFEST)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+            if self.manifest.get("format") != STORE_FORMAT:
+                raise ValueError(f"Unsupported trend store format: {self.manifest.get('format')}")
+        else:
+            self.manifest = {"format": STORE_FORMAT, "n_buckets": n_buckets, "partitions": []}
+
+    @property
+    def n_buckets(self) -> int:
+        return self.manifest["n_buckets"]
+
+    @property
+    def partitions(self) -> List[dict]:
+        return self.manifest["partitions"]
+
+    def date_range(self):
+        """(first, last) date held by the store, or (None, None) when empty."""
+        if not self.partitions:
+            return None, None
+        dates = [p["date"] for p in self.partitions]
+        return min(dates), max(dates)
+
+    def append(self, df: pd.DataFrame) -> List[dict]:
+        """
+        Add rows (any mix of days and trends) as new partitions.
+        Existing partitions are never rewritten.
+
+        Args:
+            df: Rows with date, trend_name and metric columns
+
+        Returns:
+            Manifest entries of the partitions written
+        """
+        missing = [c for c in ("date", "trend_name") if c not in df.columns]
+        if missing:
+            raise ValueError(f"Rows must contain columns: {missing}")
+        if len(df) == 0:
+            return []
+
+        df = to_columnar(df.assign(date=_normalize_dates(df["date"])))
+        buckets = np.array([trend_bucket(t, self.n_buckets) for t in df["trend_name"].astype(str)])
+
+        written = []
+        for (date, bucket), rows in df.groupby([df["date"], buckets], sort=True):
+            rows = rows.sort_values("trend_name", kind="stable")
+            rows = rows.assign(trend_name=rows["trend_name"].astype(str))
+            payload = rows.to_parquet(index=False)
+            digest = hashlib.sha256(payload).hexdigest()[:16]
+
+            rel = os.path.join(f"date={date}", f"bucket={bucket:02d}", f"part-{digest}.parquet")
+            full = os.path.join(self.path, rel)
+            os.makedirs(os.path.dirname(full), exist_ok=True)
+
+            def write_partition(tmp, payload=payload):
+                with open(tmp, "wb") as f:
+                    f.write(payload)
+            _atomic_write(full, write_partition)
+
+            written.append({
+                "file": rel,
+                "date": date,
+                "bucket": int(bucket),
+                "rows": len(rows),
+                "created_at": datetime.now().isoformat()
+            })
+
+        # Publish the new partitions only once every file is in place
+        self.partitions.extend(written)
+        os.makedirs(self.path, exist_ok=True)
+        _atomic_write(os.path.join(self.path, MANIFEST), lambda tmp: _write_json(tmp, self.manifest))
+        return written
+
+    def prune(
+        self,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        trend_names: Optional[List[str]] = None
+    ) -> List[dict]:
+        """Partitions that can hold rows for the date range (inclusive) and trends."""
+        buckets = None
+        if trend_names is not None:
+            buckets = {trend_bucket(t, self.n_buckets) for t in trend_names}
+        return [
+            p for p in self.partitions
+            if (start_date is None or p["date"] >= start_date)
+            and (end_date is None or p["date"] <= end_date)
+            and (buckets is None or p["bucket"] in buckets)
+        ]
+
+    def read(
+        self,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        trend_names: Optional[List[str]] = None,
+        columns: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """
+        Read rows for a date range and/or set of trends, opening only the
+        matching partitions.
+
+        Args:
+            start_date, end_date: Inclusive ISO dates (default: unbounded)
+            trend_names: Only these trends (default: all)
+            columns: Columns to read (default: all)
+
+        Returns:
+            DataFrame sorted by (trend_name, date)
+        """
+        start_date = _normalize_dates(pd.Series([start_date]))[0] if start_date else None
+        end_date = _normalize_dates(pd.Series([end_date]))[0] if end_date else None
+
+        if columns is not None:
+            columns = list(dict.fromkeys(["trend_name", "date"] + list(columns)))
+        filters = [("trend_name", "in", list(trend_names))] if trend_names is not None else None
+
+        frames = [
+            pd.read_parquet(os.path.join(self.path, p["file"]), columns=columns, filters=filters)
+            for p in self.prune(start_date, end_date, trend_names)
+        ]
+        frames = [f for f in frames if len(f)]
+        if not frames:
+            return pd.DataFrame(columns=columns or ["trend_name", "date"])
+
+        df = pd.concat(frames, ignore_index=True)
+        # Partition files carry their own category dictionaries; unify them
+        for col in CATEGORY_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].astype(str).astype("category")
+        return df.sort_values(["trend_name", "date"], kind="stable").reset_index(drop=True)
+
+    def import_file(self, filepath: str) -> List[dict]:
+        """Seed the store from an existing CSV/XLSX dataset."""
+        from .data_loader import read_source
+        return self.append(read_source(filepath))